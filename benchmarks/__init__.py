@@ -0,0 +1 @@
+# standalone performance scripts, run them with `python -m benchmarks.<name>`
@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+import numpy as np
+
+from server import config
+from server.auth import crud, routes
+from server.auth.schemas import UserInDB
+from server.database import MongoConnectionManager
+
+
+async def authenticated_request(token):
+    """What /users/me/ does: resolve the token, then read the profile."""
+    user = await routes.get_current_user(token)
+    return await routes.read_users_me(user)
+
+
+async def measure(token, n_requests, cached):
+    latencies = []
+    for _ in range(n_requests):
+        if not cached:
+            routes.token_cache.clear()
+            crud.user_cache.clear()
+        start = time.perf_counter()
+        await authenticated_request(token)
+        latencies.append(time.perf_counter() - start)
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "cached": cached,
+        "requests": n_requests,
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=(
+            "latency of resolving the current user with and without the "
+            "token and user caches, against the configured MongoDB"
+        )
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument(
+        "--database",
+        default="prop_hub_benchmark",
+        help="scratch database, a benchmark user is added to it",
+    )
+    parser.add_argument("--output", help="write the reports to a JSON file")
+    args = parser.parse_args(argv)
+
+    # the connection managers read the database name on every use
+    config.settings["database_name"] = args.database
+    username = "benchmark-user"
+    with MongoConnectionManager(crud.auth_collection_name) as conn:
+        conn.delete_many({"username": username})
+        conn.insert_one(
+            UserInDB(username=username, hashed_password="-").dict()
+        )
+    token = routes.create_access_token(
+        {"sub": username}, expires_delta=timedelta(hours=1)
+    )
+
+    async def run():
+        return [
+            await measure(token, args.requests, cached=False),
+            await measure(token, args.requests, cached=True),
+        ]
+
+    reports = asyncio.run(run())
+    for report in reports:
+        print(json.dumps(report))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reports, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,82 @@
+import argparse
+import time
+
+import numpy as np
+
+from server.search.geo import BruteForceGeoIndex, GeoIndex
+
+# roughly the Melbourne area covered by the catalog
+LATITUDES = (-38.2, -37.4)
+LONGITUDES = (144.4, 145.5)
+
+
+def synthetic_points(n_points, seed=0):
+    rng = np.random.default_rng(seed)
+    return (
+        rng.uniform(*LATITUDES, n_points),
+        rng.uniform(*LONGITUDES, n_points),
+    )
+
+
+def timed(query, points):
+    start = time.perf_counter()
+    for lat, lon in points:
+        query(lat, lon)
+    return (time.perf_counter() - start) / len(points) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="nearest and radius latency, ball tree vs brute force"
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10_000, 100_000, 1_000_000],
+    )
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--radius-km", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    queries = np.column_stack(synthetic_points(args.queries, seed=1))
+    # import scikit-learn outside of the timed build
+    GeoIndex(*synthetic_points(10))
+    print(
+        f"{'points':>10} {'build ms':>9} {'knn ms':>8} {'brute knn':>10}"
+        f" {'radius ms':>10} {'brute rad':>10}"
+    )
+    for size in args.sizes:
+        latitudes, longitudes = synthetic_points(size)
+        start = time.perf_counter()
+        index = GeoIndex(latitudes, longitudes)
+        build_ms = (time.perf_counter() - start) * 1000
+        brute = BruteForceGeoIndex(latitudes, longitudes)
+
+        for lat, lon in queries[:10]:
+            found, _ = index.nearest(lat, lon, args.k)
+            expected, _ = brute.nearest(lat, lon, args.k)
+            if set(found) != set(expected):
+                print(f"mismatch at {size} points for ({lat}, {lon})")
+                return 1
+
+        knn = timed(lambda lat, lon: index.nearest(lat, lon, args.k), queries)
+        brute_knn = timed(
+            lambda lat, lon: brute.nearest(lat, lon, args.k), queries
+        )
+        radius = timed(
+            lambda lat, lon: index.within(lat, lon, args.radius_km), queries
+        )
+        brute_radius = timed(
+            lambda lat, lon: brute.within(lat, lon, args.radius_km), queries
+        )
+        print(
+            f"{size:>10} {build_ms:>9.1f} {knn:>8.3f} {brute_knn:>10.3f}"
+            f" {radius:>10.3f} {brute_radius:>10.3f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
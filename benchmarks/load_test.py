@@ -0,0 +1,92 @@
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+
+def worker(base_url, paths, deadline, latencies, errors, lock):
+    session = requests.Session()
+    position = 0
+    while time.perf_counter() < deadline:
+        path = paths[position % len(paths)]
+        position += 1
+        start = time.perf_counter()
+        try:
+            response = session.get(base_url + path, timeout=60)
+            ok = response.status_code < 500
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors.append(elapsed)
+
+
+def run(base_url, paths, concurrency, duration):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(
+                worker, base_url, paths, deadline, latencies, errors, lock
+            )
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    report = {
+        "concurrency": concurrency,
+        "duration_seconds": round(elapsed, 3),
+        "requests": len(latencies) + len(errors),
+        "errors": len(errors),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+    }
+    if len(latencies_ms):
+        for percentile in (50, 95, 99):
+            report[f"p{percentile}_ms"] = round(
+                float(np.percentile(latencies_ms, percentile)), 2
+            )
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=(
+            "concurrent GET load against a running server, run it before "
+            "and after a change and compare the reports"
+        )
+    )
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument(
+        "--path",
+        action="append",
+        help="request path, may be repeated (default: a search and /)",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 8, 32]
+    )
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--output", help="write the reports to a JSON file")
+    args = parser.parse_args(argv)
+
+    paths = args.path or ["/search/?text=quiet%20house%20with%20garden", "/"]
+    reports = []
+    for concurrency in args.concurrency:
+        report = run(args.url, paths, concurrency, args.duration)
+        reports.append(report)
+        print(json.dumps(report))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"paths": paths, "runs": reports}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import json
+import threading
+import time
+
+import requests
+
+from benchmarks.load_test import run
+
+
+def login_worker(base_url, credentials, stop, counters, lock):
+    session = requests.Session()
+    while not stop.is_set():
+        try:
+            response = session.post(
+                base_url + "/token/", data=credentials, timeout=60
+            )
+            key = str(response.status_code)
+        except requests.RequestException:
+            key = "error"
+        with lock:
+            counters[key] = counters.get(key, 0) + 1
+
+
+def storm(base_url, credentials, logins, paths, concurrency, duration):
+    """Measure ``paths`` while ``logins`` clients log in nonstop."""
+    stop = threading.Event()
+    counters, lock = {}, threading.Lock()
+    threads = [
+        threading.Thread(
+            target=login_worker,
+            args=(base_url, credentials, stop, counters, lock),
+            daemon=True,
+        )
+        for _ in range(logins)
+    ]
+    for thread in threads:
+        thread.start()
+    start = time.perf_counter()
+    report = run(base_url, paths, concurrency, duration)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    report["login_clients"] = logins
+    report["logins"] = counters
+    report["login_rps"] = round(counters.get("200", 0) / elapsed, 2)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=(
+            "throughput and latency of unrelated endpoints on a running "
+            "server while many clients log in at once"
+        )
+    )
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument(
+        "--path",
+        action="append",
+        help="unrelated request path, may be repeated (default: /)",
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--logins", type=int, nargs="+", default=[0, 8, 32, 128]
+    )
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--username", default="benchmark-login")
+    parser.add_argument("--password", default="benchmark-password")
+    parser.add_argument("--output", help="write the reports to a JSON file")
+    args = parser.parse_args(argv)
+
+    # 400 when the user is left over from an earlier run
+    requests.post(
+        args.url + "/users/",
+        json={"username": args.username, "password": args.password},
+        timeout=60,
+    )
+    credentials = {"username": args.username, "password": args.password}
+    paths = args.path or ["/"]
+
+    reports = []
+    for logins in args.logins:
+        report = storm(
+            args.url,
+            credentials,
+            logins,
+            paths,
+            args.concurrency,
+            args.duration,
+        )
+        reports.append(report)
+        print(json.dumps(report))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"paths": paths, "runs": reports}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,89 @@
+import argparse
+import json
+import time
+
+from server import config
+from server.database import MongoConnectionManager
+from server.search import utils
+
+
+def synthetic_recommendations(n_users, per_user, n_properties=20000):
+    return [
+        {
+            "user_id": f"user-{user}",
+            "property_id": [
+                str((user * 7919 + position * 104729) % n_properties)
+                for position in range(per_user)
+            ],
+        }
+        for user in range(n_users)
+    ]
+
+
+def replace_all(data):
+    """The previous publish path: wipe the collection and insert again."""
+    with MongoConnectionManager("generated_recommendation") as conn:
+        conn.delete_many({})
+        conn.insert_many(data)
+
+
+def timed(publish, data):
+    # insert_many sets ``_id`` on the documents, publish fresh copies
+    documents = [dict(doc) for doc in data]
+    start = time.perf_counter()
+    publish(documents)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=(
+            "write throughput of the generated_recommendation publish "
+            "paths against the configured MongoDB"
+        )
+    )
+    parser.add_argument("--users", type=int, nargs="+", default=[100_000])
+    parser.add_argument("--per-user", type=int, default=10)
+    parser.add_argument(
+        "--database",
+        default="prop_hub_benchmark",
+        help="scratch database, its generated_recommendation is replaced",
+    )
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--output", help="write the reports to a JSON file")
+    args = parser.parse_args(argv)
+
+    # the connection managers read the database name on every use
+    config.settings["database_name"] = args.database
+
+    reports = []
+    for n_users in args.users:
+        data = synthetic_recommendations(n_users, args.per_user)
+        paths = {
+            "delete_and_insert": replace_all,
+            "staging_and_rename": lambda documents: (
+                utils.reupload_collaborative_recommedation_data(
+                    documents, args.chunk_size
+                )
+            ),
+            "upsert": utils.upsert_generated_recommendations,
+        }
+        for name, publish in paths.items():
+            elapsed = timed(publish, data)
+            report = {
+                "path": name,
+                "users": n_users,
+                "seconds": round(elapsed, 3),
+                "documents_per_second": round(n_users / elapsed, 1),
+            }
+            reports.append(report)
+            print(json.dumps(report))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reports, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
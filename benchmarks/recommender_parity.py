@@ -0,0 +1,57 @@
+import argparse
+import time
+
+import pandas as pd
+
+from server.search import recommender, utils
+
+
+def legacy_recommend_all(df, m):
+    user_item = utils.create_user_item_matrix(df)
+    return [
+        {
+            "user_id": user_id,
+            "property_id": list(utils.user_user_recs(user_id, user_item, m)),
+        }
+        for user_id in df.user_id.unique()
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="compare the sparse recommender with user_user_recs"
+    )
+    parser.add_argument("--data", default="user_item.csv")
+    parser.add_argument("--m", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    # ids are stored as strings in mongo
+    df = pd.read_csv(args.data, dtype=str)
+
+    start = time.perf_counter()
+    expected = legacy_recommend_all(df, args.m)
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    found = recommender.recommend_all(df, args.m)
+    sparse_s = time.perf_counter() - start
+
+    mismatches = [
+        old["user_id"] for old, new in zip(expected, found) if old != new
+    ]
+    if len(expected) != len(found):
+        mismatches.append("<user count>")
+
+    print(
+        f"users={len(expected)} legacy={legacy_s:.2f}s "
+        f"sparse={sparse_s:.3f}s"
+    )
+    if mismatches:
+        print(f"{len(mismatches)} mismatching users, e.g. {mismatches[:5]}")
+        return 1
+    print("identical recommendations")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,50 @@
+import argparse
+import json
+import subprocess
+import sys
+
+IMPORT_SNIPPET = """
+import json, time
+start = time.perf_counter()
+import server.main
+imported = time.perf_counter()
+from server.search import resources
+resources.warmup()
+warm = time.perf_counter()
+print(json.dumps({
+    "import_seconds": imported - start,
+    "warmup_seconds": warm - imported,
+    "ready_seconds": warm - start,
+}))
+"""
+
+
+def measure():
+    # a fresh interpreter each time, module caches would hide the cost
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="time importing the app and warming up its resources"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    runs = [measure() for _ in range(args.repeat)]
+    for name in ("import_seconds", "warmup_seconds", "ready_seconds"):
+        values = sorted(run[name] for run in runs)
+        print(
+            f"{name:<16} min={values[0]:.3f} "
+            f"median={values[len(values) // 2]:.3f} max={values[-1]:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
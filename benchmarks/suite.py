@@ -0,0 +1,293 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_catalog, make_likes
+from benchmarks.vector_index_recall import synthetic_embeddings
+from server import config, database, indexes
+from server.auth import crud
+from server.auth.schemas import UserInDB
+from server.search import embeddings, recommender, resources, routes, utils
+from server.search.catalog import Catalog
+
+QUERY = "renovated family house with a garden close to the beach"
+
+
+def use_memory_backend():
+    """Point both database clients at one in-memory mongomock store."""
+    try:
+        import mongomock
+        import mongomock_motor
+    except ImportError:
+        raise SystemExit(
+            "the memory backend needs mongomock and mongomock-motor, "
+            "install them or pass --backend mongo"
+        )
+
+    client = mongomock.MongoClient()
+    database._client = client
+    database._async_client = mongomock_motor.AsyncMongoMockClient(
+        mock_mongo_client=client
+    )
+
+
+def measure(func, repeat):
+    """Call ``func`` ``repeat`` times, returns the timings in ms."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return summarize(timings)
+
+
+def summarize(timings):
+    timings = sorted(timings)
+    return {
+        "runs": len(timings),
+        "min_ms": round(timings[0], 3),
+        "median_ms": round(statistics.median(timings), 3),
+        # interpolated, with a few runs it lies between the two slowest
+        "p95_ms": round(float(np.percentile(timings, 95)), 3),
+        "max_ms": round(timings[-1], 3),
+    }
+
+
+def seed_database(catalog, likes):
+    client = database.get_client()
+    client.drop_database(config.read_config("database_name"))
+
+    details = catalog.astype({"id": str})
+    records = details.replace({np.nan: None}).to_dict("records")
+    with database.MongoConnectionManager("real_estate_details") as conn:
+        conn.insert_many(records)
+    with database.MongoConnectionManager(
+        "collaborative_recommendation"
+    ) as conn:
+        conn.insert_many(likes.to_dict("records"))
+    indexes.ensure_indexes()
+
+
+def load_resources(catalog, dimension):
+    """
+    Install search resources for ``catalog`` with random embeddings, the
+    scoring cost depends on the matrix shape only, not on the model.
+    """
+    current = Catalog.from_frame(catalog)
+    index = embeddings.EmbeddingIndex(
+        synthetic_embeddings(len(catalog), dimension),
+        np.array(current.ids, dtype=object),
+        {},
+    )
+    resources._resources = resources.SearchResources(current, index)
+    return resources._resources
+
+
+def search_benchmarks(catalog, args):
+    reports = {}
+    start = time.perf_counter()
+    load_resources(catalog, args.dimension)
+    reports["build_resources"] = summarize(
+        [(time.perf_counter() - start) * 1000]
+    )
+
+    rng = np.random.default_rng(args.seed)
+    query_embedding = rng.standard_normal(args.dimension).astype(np.float32)
+    reports["prepare_scores"] = measure(
+        lambda: routes.prepare_scores(QUERY, query_embedding), args.repeat
+    )
+    # the work behind /stats/, without the result cache
+    reports["get_statistics"] = measure(
+        lambda: routes.compute_statistics(QUERY, query_embedding),
+        args.repeat,
+    )
+    reports["search_properties"] = measure(
+        lambda: routes.search_properties(QUERY, 10, query_embedding),
+        args.repeat,
+    )
+    return reports
+
+
+def recommendation_benchmarks(likes, args):
+    reports = {}
+    if len(likes) <= args.legacy_max_likes:
+        # the dense crosstab needs users x properties cells
+        user_item = utils.create_user_item_matrix(likes)
+        reports["create_user_item_matrix"] = measure(
+            lambda: utils.create_user_item_matrix(likes), args.repeat
+        )
+        sampled = likes.user_id.unique()[: args.sampled_users]
+        reports["user_user_recs"] = measure(
+            lambda: [
+                utils.user_user_recs(user_id, user_item) for user_id in sampled
+            ],
+            1,
+        )
+        reports["user_user_recs"]["users"] = len(sampled)
+    else:
+        skipped = {"skipped": f"more than {args.legacy_max_likes} likes"}
+        reports["create_user_item_matrix"] = skipped
+        reports["user_user_recs"] = skipped
+
+    reports["recommend_all"] = measure(
+        lambda: recommender.recommend_all(likes), 1
+    )
+    reports["preperare_recommendation"] = measure(
+        routes.preperare_recommendation, 1
+    )
+    return reports
+
+
+async def crud_benchmarks(likes, catalog, args):
+    reports = {}
+    rng = np.random.default_rng(args.seed)
+    user_ids = likes.user_id.unique()
+    users = [str(u) for u in rng.choice(user_ids, args.operations)]
+    property_ids = [
+        str(p) for p in rng.choice(catalog["id"].to_numpy(), args.operations)
+    ]
+
+    async def timed(operation, arguments):
+        timings = []
+        for argument in arguments:
+            start = time.perf_counter()
+            await operation(*argument)
+            timings.append((time.perf_counter() - start) * 1000)
+        return summarize(timings)
+
+    names = [f"benchmark-{i}" for i in range(args.operations)]
+    reports["create_user"] = await timed(
+        crud.create_user,
+        [
+            (UserInDB(username=name, hashed_password="x" * 60),)
+            for name in names
+        ],
+    )
+    # every name is read once, so each read misses the cache
+    crud.user_cache.clear()
+    reports["read_user"] = await timed(
+        crud.read_user_record, [(name,) for name in names]
+    )
+    pairs = [
+        (f"benchmark-{i:016x}", property_id)
+        for i, property_id in enumerate(property_ids)
+    ]
+    reports["create_like_record"] = await timed(
+        utils.create_like_record, pairs
+    )
+    reports["read_like_record"] = await timed(
+        utils.read_like_record, [(user,) for user in users]
+    )
+    reports["read_liked_property_details"] = await timed(
+        utils.read_liked_property_details, [(user,) for user in users]
+    )
+    reports["read_single_property_data"] = await timed(
+        utils.read_single_property_data, [(p,) for p in property_ids]
+    )
+    reports["delete_like_record"] = await timed(
+        utils.delete_like_record, pairs
+    )
+    return reports
+
+
+def run_scale(n_properties, n_likes, args):
+    catalog = make_catalog(n_properties, args.source, args.seed)
+    likes = make_likes(n_likes, catalog["id"], seed=args.seed)
+
+    start = time.perf_counter()
+    seed_database(catalog, likes)
+    seconds = time.perf_counter() - start
+
+    report = {
+        "properties": n_properties,
+        "likes": n_likes,
+        "users": int(likes.user_id.nunique()),
+        "seed_database_s": round(seconds, 3),
+    }
+    benchmarks = {}
+    benchmarks.update(search_benchmarks(catalog, args))
+    benchmarks.update(recommendation_benchmarks(likes, args))
+    benchmarks.update(asyncio.run(crud_benchmarks(likes, catalog, args)))
+    report["benchmarks"] = benchmarks
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=(
+            "time the search, statistics, recommendation and CRUD paths on "
+            "synthetic data of increasing size"
+        )
+    )
+    parser.add_argument(
+        "--properties", type=int, nargs="+", default=[1_600, 100_000]
+    )
+    parser.add_argument(
+        "--likes",
+        type=int,
+        nargs="+",
+        default=[2_000, 1_000_000],
+        help="one value per --properties value",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["memory", "mongo"],
+        default="memory",
+        help="in-memory mongomock, or the configured MongoDB",
+    )
+    parser.add_argument(
+        "--database",
+        default="prop_hub_benchmark",
+        help="scratch database, dropped before every scale",
+    )
+    parser.add_argument("--source", default="final.csv")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--operations", type=int, default=200)
+    parser.add_argument("--sampled-users", type=int, default=20)
+    parser.add_argument("--legacy-max-likes", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report to a JSON file")
+    args = parser.parse_args(argv)
+    if len(args.properties) != len(args.likes):
+        parser.error("pass as many --likes as --properties values")
+
+    if args.backend == "memory":
+        use_memory_backend()
+    # the connection managers read the database name on every use
+    config.settings["database_name"] = args.database
+
+    runs = []
+    for n_properties, n_likes in zip(args.properties, args.likes):
+        report = run_scale(n_properties, n_likes, args)
+        runs.append(report)
+        print(json.dumps(report))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "environment": {
+                        "python": platform.python_version(),
+                        "numpy": np.__version__,
+                        "machine": platform.machine(),
+                        "cpus": os.cpu_count(),
+                        "backend": args.backend,
+                    },
+                    "arguments": vars(args),
+                    "runs": runs,
+                },
+                f,
+                indent=2,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
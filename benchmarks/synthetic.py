@@ -0,0 +1,100 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def make_catalog(n_properties, source="final.csv", seed=0):
+    """
+    ``n_properties`` rows with the columns of ``final.csv``.
+
+    Rows are resampled from ``source`` and get fresh ids. Coordinates are
+    jittered and prices rescaled so the range and geo indexes do not see
+    thousands of identical values.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.read_csv(source)
+    picked = rng.integers(0, len(df), n_properties)
+    catalog = df.iloc[picked].reset_index(drop=True)
+
+    catalog["id"] = np.arange(n_properties)
+    for column in ("Lattitude", "Longtitude"):
+        jitter = rng.normal(0, 0.01, n_properties)
+        catalog[column] = (catalog[column] + jitter).round(5)
+    factor = rng.lognormal(0, 0.1, n_properties)
+    catalog["Price"] = (catalog["Price"] * factor).round()
+    return catalog
+
+
+def make_likes(n_likes, property_ids, n_users=None, seed=0):
+    """
+    ``n_likes`` distinct (user, property) pairs with the columns of
+    ``user_item.csv``.
+
+    Property popularity and user activity both follow a power law, a few
+    properties collect most likes and a few users like a lot, as in the
+    real data. User ids look like the ObjectIds of ``users``.
+    """
+    rng = np.random.default_rng(seed)
+    property_ids = np.asarray([str(p) for p in property_ids], dtype=object)
+    n_users = n_users or max(1, n_likes // 20)
+    if n_likes > n_users * len(property_ids):
+        raise ValueError("more likes than (user, property) pairs")
+
+    def power_law(n, exponent):
+        weights = 1.0 / np.arange(1, n + 1) ** exponent
+        return rng.permutation(weights / weights.sum())
+
+    property_weights = power_law(len(property_ids), 0.8)
+    user_weights = power_law(n_users, 0.5)
+
+    pairs = np.empty(0, dtype=np.int64)
+    while len(pairs) < n_likes:
+        # draw extra pairs, duplicates are dropped below
+        n_draws = int((n_likes - len(pairs)) * 1.2) + 16
+        users = rng.choice(n_users, n_draws, p=user_weights)
+        properties = rng.choice(len(property_ids), n_draws, p=property_weights)
+        drawn = users.astype(np.int64) * len(property_ids) + properties
+        pairs = pd.unique(np.concatenate([pairs, drawn]))
+    pairs = pairs[:n_likes]
+
+    users, properties = np.divmod(pairs, len(property_ids))
+    return pd.DataFrame(
+        {
+            "property_id": property_ids[properties],
+            "user_id": [f"{user:024x}" for user in users],
+        }
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=(
+            "write a scaled-up final.csv and user_item.csv with the same "
+            "columns as the originals"
+        )
+    )
+    parser.add_argument("--properties", type=int, default=100_000)
+    parser.add_argument("--likes", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=None)
+    parser.add_argument("--source", default="final.csv")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", default="synthetic")
+    args = parser.parse_args(argv)
+
+    catalog = make_catalog(args.properties, args.source, args.seed)
+    likes = make_likes(args.likes, catalog["id"], args.users, args.seed)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    catalog.to_csv(os.path.join(args.output_dir, "final.csv"), index=False)
+    likes.to_csv(os.path.join(args.output_dir, "user_item.csv"), index=False)
+    print(
+        f"{len(catalog)} properties and {len(likes)} likes of "
+        f"{likes.user_id.nunique()} users written to {args.output_dir}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
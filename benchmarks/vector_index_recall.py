@@ -0,0 +1,90 @@
+import argparse
+import time
+
+import numpy as np
+
+from server.search.embeddings import load_index
+from server.search.vector_index import ExactIndex, IVFIndex
+
+
+def synthetic_embeddings(n_rows, dimension, n_clusters=64, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, n_rows)
+    noise = rng.standard_normal((n_rows, dimension)).astype(np.float32)
+    embeddings = centers[labels] + 0.5 * noise
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings
+
+
+def make_queries(embeddings, n_queries, seed=1):
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(embeddings.shape[0], n_queries, replace=False)
+    noise = rng.standard_normal((n_queries, embeddings.shape[1]))
+    return embeddings[picked] + 0.1 * noise.astype(np.float32)
+
+
+def timed_search(index, queries, k, **kwargs):
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        positions, _ = index.search(query, k, **kwargs)
+        results.append(positions)
+    elapsed = time.perf_counter() - start
+    return results, elapsed / len(queries) * 1000
+
+
+def recall(results, truth):
+    hits = [
+        len(np.intersect1d(found, expected)) / len(expected)
+        for found, expected in zip(results, truth)
+    ]
+    return float(np.mean(hits))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="recall and latency of the IVF backend against exact"
+    )
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        default=0,
+        help="use N random embeddings instead of the persisted index",
+    )
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-lists", type=int, default=0)
+    parser.add_argument(
+        "--n-probe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32]
+    )
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        embeddings = synthetic_embeddings(args.synthetic, args.dimension)
+    else:
+        index = load_index()
+        if index is None:
+            parser.error("no embedding index found, build it or --synthetic")
+        embeddings = np.asarray(index.embeddings)
+
+    queries = make_queries(embeddings, min(args.queries, len(embeddings)))
+    exact = ExactIndex(embeddings)
+    truth, exact_ms = timed_search(exact, queries, args.k)
+
+    start = time.perf_counter()
+    ivf = IVFIndex(embeddings, n_lists=args.n_lists)
+    build_s = time.perf_counter() - start
+
+    print(f"rows={len(embeddings)} lists={ivf.n_lists} build={build_s:.2f}s")
+    print(f"{'backend':<16}{'recall@' + str(args.k):>10}{'ms/query':>10}")
+    print(f"{'exact':<16}{1.0:>10.3f}{exact_ms:>10.3f}")
+    for n_probe in args.n_probe:
+        results, ivf_ms = timed_search(ivf, queries, args.k, n_probe=n_probe)
+        label = f"ivf n_probe={n_probe}"
+        print(f"{label:<16}{recall(results, truth):>10.3f}{ivf_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,68 @@
-from ..database import MongoConnectionManager
+from ..cache import TTLCache
+from ..config import read_config
+from ..database import AsyncMongoConnectionManager
 
 from .schemas import User, UserInDB
 
 auth_collection_name = "users"
+# username -> full user document, ``_id`` included, shared by every
+# authenticated request of the worker
+user_cache = TTLCache(
+    read_config("auth_cache_size"), read_config("auth_cache_ttl_seconds")
+)
 
 
-def create_user(user: UserInDB):
+async def create_user(user: UserInDB):
     data = user.dict()
-    with MongoConnectionManager(auth_collection_name) as conn:
-        conn.insert_one(data)
+    async with AsyncMongoConnectionManager(auth_collection_name) as conn:
+        await conn.insert_one(data)
+    invalidate_user(user.username)
     
     return User(**data)
 
 
-def read_user(username):
-    query = {"username": username}
-    user_data = None
-    with MongoConnectionManager(auth_collection_name) as conn:
-        user_data = list(conn.find(query, {"_id": 0}).limit(1))
-        if user_data:
-            user_data = user_data[0]
-    
-    return user_data
-
-
-def is_exist_user(username):
+async def is_exist_user(username):
     query = {"username": username}
     is_exist = None
-    with MongoConnectionManager(auth_collection_name) as conn:
-        user_data = list(conn.find(query, {"_id": 0}))
+    async with AsyncMongoConnectionManager(auth_collection_name) as conn:
+        user_data = await conn.find_one(query, {"_id": 1})
         is_exist = True if user_data else False
     
     return is_exist
 
 
-def read_user_with_id(username):
+async def read_user_with_id(username):
     query = {"username": username}
     user_data = None
-    with MongoConnectionManager(auth_collection_name) as conn:
-        user_data = list(conn.find(query).limit(1))
-        if user_data:
-            user_data = user_data[0]
+    async with AsyncMongoConnectionManager(auth_collection_name) as conn:
+        user_data = await conn.find_one(query)
     
     return user_data
+
+
+async def update_password_hash(username, hashed_password):
+    query = {"username": username}
+    async with AsyncMongoConnectionManager(auth_collection_name) as conn:
+        await conn.update_one(
+            query, {"$set": {"hashed_password": hashed_password}}
+        )
+    invalidate_user(username)
+
+
+async def read_user_record(username):
+    """
+    The user document, ``_id`` included, served from ``user_cache`` when
+    possible. One query covers both the credentials check and the
+    profile, missing users are not cached.
+    """
+    user_data = user_cache.get(username)
+    if user_data is None:
+        user_data = await read_user_with_id(username)
+        if user_data:
+            user_cache.set(username, user_data)
+    return user_data
+
+
+def invalidate_user(username):
+    """Drop the cached record, call after every change to the user."""
+    user_cache.pop(username)
@@ -1,3 +1,4 @@
+import time
 from typing import Union
 from jose import JWTError, jwt
 from pydantic import ValidationError
@@ -6,27 +7,66 @@ from passlib.context import CryptContext
 from fastapi import APIRouter, HTTPException, status, Depends, Body
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 
+from .. import metrics
+from ..cache import TTLCache
+from ..concurrency import BoundedExecutor, ExecutorBusy
 from ..database import read_config
 
-from .crud import create_user, read_user, is_exist_user, read_user_with_id
+from .crud import (
+    create_user,
+    is_exist_user,
+    read_user_record,
+    update_password_hash,
+)
 from .schemas import Token, TokenData, User, UserCreate, UserWithID, UserInDB, Encoder
 
 router = APIRouter()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+bcrypt_rounds = read_config("bcrypt_rounds")
+# min and max pinned to the configured cost, so a hash made with any other
+# cost is flagged for rehashing on the next login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=bcrypt_rounds,
+    bcrypt__min_rounds=bcrypt_rounds,
+    bcrypt__max_rounds=bcrypt_rounds,
+)
+# bcrypt gets its own workers so a login burst neither blocks the event
+# loop nor starves the search work of the shared CPU pool
+password_executor = BoundedExecutor(
+    "password-hash",
+    read_config("password_hash_workers"),
+    read_config("password_hash_max_pending"),
+)
+# token -> TokenData of a verified token, never kept past its expiry
+token_cache = TTLCache(
+    read_config("auth_cache_size"), read_config("auth_cache_ttl_seconds")
+)
 
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
 
-def get_user(username: str):
-    user_data = read_user(username)
+def verify_and_update_password(plain_password, hashed_password):
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+async def run_password_hashing(func, *args):
+    try:
+        return await password_executor.run(func, *args)
+    except ExecutorBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="too many concurrent logins, retry later",
+            headers={"Retry-After": "1"},
+        )
+
+
+async def get_user(username: str):
+    user_data = await read_user_record(username)
     if user_data:
         return UserInDB(**user_data)
 
@@ -37,15 +77,24 @@ def read_secrets():
     return Encoder(secret_key=secret_key, algorithm=algorithm)
 
 
-def authenticate_user(username: str, password: str):
-    user = get_user(username)
+async def authenticate_user(username: str, password: str):
+    user = await get_user(username)
     
     if not user:
         return False
     
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await run_password_hashing(
+        verify_and_update_password, password, user.hashed_password
+    )
+    if not valid:
         return False
     
+    if new_hash:
+        # the stored hash used another cost, replace it now that the
+        # plain password is at hand
+        await update_password_hash(username, new_hash)
+        user.hashed_password = new_hash
+    
     return user
 
 
@@ -62,6 +111,31 @@ def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None
     return encoded_jwt
 
 
+def decode_token(token: str, encoder_kw: Encoder):
+    try:
+        with metrics.span("token_decode"):
+            payload = jwt.decode(
+                token,
+                encoder_kw.secret_key,
+                algorithms=[encoder_kw.algorithm],
+            )
+        username: str = payload.get("sub")
+        
+        if username is None:
+            return None
+        token_data = TokenData(username=username)
+    except (JWTError, ValidationError):
+        return None
+    
+    # cached no longer than the token is valid
+    ttl = token_cache.ttl
+    if "exp" in payload:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        token_cache.set(token, token_data, ttl)
+    return token_data
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     encoder_kw: Encoder = read_secrets()
     credentials_exception = HTTPException(
@@ -70,17 +144,13 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        payload = jwt.decode(token, encoder_kw.secret_key, algorithms=[encoder_kw.algorithm])
-        username: str = payload.get("sub")
-        
-        if username is None:
+    token_data = token_cache.get(token)
+    if token_data is None:
+        token_data = decode_token(token, encoder_kw)
+        if token_data is None:
             raise credentials_exception
-        token_data = TokenData(username=username)
-    except (JWTError, ValidationError):
-        raise credentials_exception
     
-    user = get_user(username=token_data.username)
+    user = await get_user(username=token_data.username)
     if not user:
         raise credentials_exception
     
@@ -95,7 +165,7 @@ async def get_access_token(user: User):
 
 @router.post("/token/", response_model=Token, tags=["user"])
 async def read_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(form_data.username, form_data.password)
+    user = await authenticate_user(form_data.username, form_data.password)
     
     if not user:
         raise HTTPException(
@@ -109,25 +179,36 @@ async def read_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
 
 
 @router.get("/users/me/", response_model=UserWithID, tags=["user"])
-def read_users_me(current_user: User = Depends(get_current_user)):
-    user_data = read_user_with_id(current_user.username)
+async def read_users_me(current_user: User = Depends(get_current_user)):
+    # fetched and cached by get_current_user, no second query
+    user_data = await read_user_record(current_user.username)
+    if not user_data:
+        raise HTTPException(status_code=404, detail="user not found")
+    user_data = dict(user_data)
     user_data["id"] = str(user_data["_id"])
     return user_data
 
 
 @router.post("/users/", response_model=Token, tags=["user"])
 async def create_new_user(raw_user: UserCreate = Body()):
-    is_exist = is_exist_user(raw_user.username)
+    is_exist = await is_exist_user(raw_user.username)
     if is_exist:
         raise HTTPException(status_code=400, detail="username already exists")
     
-    hashed_password = get_password_hash(raw_user.password)
+    hashed_password = await run_password_hashing(
+        get_password_hash, raw_user.password
+    )
     user_data = UserInDB(
         username=raw_user.username,
         fullname=raw_user.fullname,
         hashed_password=hashed_password,
     )
     
-    user_data = create_user(user_data)
+    user_data = await create_user(user_data)
     token = await get_access_token(user_data)
     return token
+
+
+@router.get("/admin/auth/", tags=["admin"])
+async def read_password_hashing_state():
+    return password_executor.state()
@@ -0,0 +1,145 @@
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import read_config
+from .metrics import Histogram, register
+
+WAIT_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5]
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Bounded pool for CPU-heavy work (model encoding, pandas, numpy).
+
+    The heavy parts of these libraries release the GIL, so threads are
+    enough to keep them off the event loop, and the bound keeps a burst of
+    requests from oversubscribing the cores.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=read_config("cpu_executor_workers"),
+                    thread_name_prefix="cpu-bound",
+                )
+    return _executor
+
+
+async def run_cpu_bound(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+class ExecutorBusy(Exception):
+    """Raised when a ``BoundedExecutor`` queue is full."""
+
+
+class BoundedExecutor:
+    """
+    Dedicated thread pool for one kind of expensive call.
+
+    At most ``workers`` calls run at once and at most ``max_pending`` wait
+    for a worker; further calls fail fast with ``ExecutorBusy`` instead of
+    queueing without limit. Queue wait and run time are recorded, see
+    ``state``.
+    """
+
+    def __init__(self, name, workers, max_pending=None):
+        self.name = name
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_wait = register(
+            Histogram(
+                f"{name}_queue_wait_seconds",
+                WAIT_BUCKETS,
+                "time a call waited for a free worker",
+            )
+        )
+        self.run_time = register(
+            Histogram(f"{name}_run_seconds", WAIT_BUCKETS, "time a call ran")
+        )
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix=self.name
+                )
+            return self._executor
+
+    async def run(self, func, *args, **kwargs):
+        with self._lock:
+            if self.max_pending is not None and (
+                self.pending >= self.max_pending
+            ):
+                self.rejected += 1
+                raise ExecutorBusy(self.name)
+            self.pending += 1
+        submitted = time.perf_counter()
+
+        def call():
+            started = time.perf_counter()
+            with self._lock:
+                self.pending -= 1
+                self.running += 1
+            self.queue_wait.observe(started - submitted)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.run_time.observe(time.perf_counter() - started)
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+
+        future = self._get_executor().submit(call)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # a call cancelled before it started never reaches ``call``
+            if future.cancel():
+                with self._lock:
+                    self.pending -= 1
+            raise
+
+    def state(self):
+        with self._lock:
+            counters = {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "running": self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+        counters["queue_wait_seconds"] = self.queue_wait.snapshot()
+        counters["run_seconds"] = self.run_time.snapshot()
+        return counters
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
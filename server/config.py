@@ -1,3 +1,5 @@
+from typing import Union
+
 from pydantic import BaseSettings
 
 
@@ -8,6 +10,51 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int
     mongo_connection_uri: str
     database_name: str
+    mongo_max_pool_size: int = 100
+    mongo_min_pool_size: int = 0
+    mongo_connect_timeout_ms: int = 20000
+    mongo_server_selection_timeout_ms: int = 30000
+    mongo_socket_timeout_ms: Union[int, None] = None
+    mongo_wait_queue_timeout_ms: Union[int, None] = None
+    cpu_executor_workers: int = 4
+    metrics_enabled: bool = True
+    auth_cache_size: int = 10000
+    auth_cache_ttl_seconds: float = 60.0
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_max_pending: int = 64
+    inference_max_batch_size: int = 32
+    inference_max_wait_ms: float = 5.0
+    search_cache_size: int = 1024
+    search_cache_ttl_seconds: float = 300.0
+    catalog_path: str = "final.csv"
+    embedding_model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
+    embedding_index_path: str = "embedding_index"
+    embedding_index_auto_rebuild: bool = True
+    warmup_on_startup: bool = True
+    shared_catalog_path: Union[str, None] = None
+    shared_catalog_poll_seconds: float = 5.0
+    vector_index_backend: str = "exact"
+    ivf_n_lists: int = 0
+    ivf_n_probe: int = 8
+    prefilter_selectivity: float = 0.05
+    postfilter_oversample: int = 4
+    hybrid_candidates: int = 100
+    hybrid_rrf_k: int = 60
+    search_max_depth: int = 1000
+    stream_batch_size: int = 500
+    recommendation_mode: str = "incremental"
+    recommendation_rebuild_window: float = 5.0
+    recommendation_lease_seconds: float = 60.0
+    recommendation_delta_poll_seconds: float = 1.0
+    recommendation_delta_batch_size: int = 500
+    recommendation_publish_chunk_size: int = 5000
+    interaction_batch_size: int = 10000
+    recommendation_cards: bool = True
+    ensure_indexes_on_startup: bool = True
+    popularity_counters: bool = True
+    popularity_decay: bool = False
+    popularity_half_life_days: float = 30.0
 
     class Config:
         env_file = ".env"
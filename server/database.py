@@ -1,10 +1,106 @@
-from pymongo import MongoClient
+import threading
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient, monitoring
+
+from . import metrics
 from .config import read_config
 
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+mongo_command_seconds = metrics.register(
+    metrics.HistogramFamily(
+        "mongo_command_duration_seconds",
+        metrics.LATENCY_BUCKETS,
+        "MongoDB round trips per command",
+        ("command", "result"),
+    )
+)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Times every command sent by the clients (find, aggregate, ...)."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_command_seconds.labels(event.command_name, "ok").observe(
+            event.duration_micros / 1e6
+        )
+
+    def failed(self, event):
+        mongo_command_seconds.labels(event.command_name, "error").observe(
+            event.duration_micros / 1e6
+        )
+
+
+def _client_options():
+    options = {
+        "maxPoolSize": read_config("mongo_max_pool_size"),
+        "minPoolSize": read_config("mongo_min_pool_size"),
+        "connectTimeoutMS": read_config("mongo_connect_timeout_ms"),
+        "serverSelectionTimeoutMS": read_config(
+            "mongo_server_selection_timeout_ms"
+        ),
+        "socketTimeoutMS": read_config("mongo_socket_timeout_ms"),
+        "waitQueueTimeoutMS": read_config("mongo_wait_queue_timeout_ms"),
+    }
+    if metrics.enabled():
+        options["event_listeners"] = [CommandMetrics()]
+    return options
+
+
+def get_client():
+    """
+    Process-wide ``MongoClient``, created on first use.
+
+    The client owns the connection pool and is safe to share between
+    threads, so every ``MongoConnectionManager`` borrows it instead of
+    paying a new connect, handshake and server discovery per call.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(
+                    read_config("mongo_connection_uri"), **_client_options()
+                )
+    return _client
+
+
+def get_async_client():
+    """
+    Process-wide Motor client for request handlers, so database round
+    trips are awaited instead of blocking the event loop.
+    """
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncIOMotorClient(
+                    read_config("mongo_connection_uri"), **_client_options()
+                )
+    return _async_client
+
+
+def close_client():
+    global _client
+    global _async_client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+        if _async_client is not None:
+            _async_client.close()
+            _async_client = None
+
 
 class MongoConnectionManager():
     def __init__(self, collection):
-        self.client = MongoClient(read_config("mongo_connection_uri"))
+        self.client = get_client()
         self.database = read_config("database_name")
         self.collection = collection
     
@@ -14,4 +110,23 @@ class MongoConnectionManager():
         return self.collection
     
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        self.client.close()
+        # the shared client stays open, connections go back to the pool
+        pass
+
+
+class AsyncMongoConnectionManager():
+    """``async with`` counterpart of ``MongoConnectionManager``, yielding a
+    Motor collection."""
+
+    def __init__(self, collection):
+        self.client = get_async_client()
+        self.database = read_config("database_name")
+        self.collection = collection
+
+    async def __aenter__(self):
+        self.database = self.client[self.database]
+        self.collection = self.database[self.collection]
+        return self.collection
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        pass
@@ -0,0 +1,63 @@
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+from .database import MongoConnectionManager
+
+# collection -> (keys, options) of the indexes the read paths rely on
+INDEXES = {
+    "collaborative_recommendation": [
+        (
+            [("user_id", ASCENDING), ("property_id", ASCENDING)],
+            {"unique": True},
+        ),
+        ([("property_id", ASCENDING)], {}),
+    ],
+    "generated_recommendation": [
+        ([("user_id", ASCENDING)], {"unique": True}),
+    ],
+    "real_estate_details": [
+        ([("id", ASCENDING)], {}),
+    ],
+    # top-k by likes or decayed score, overall and per region, read
+    # straight off the index
+    "property_popularity": [
+        ([("property_id", ASCENDING)], {"unique": True}),
+        ([("likes", DESCENDING), ("property_id", ASCENDING)], {}),
+        ([("score", DESCENDING), ("property_id", ASCENDING)], {}),
+        (
+            [
+                ("Regionname", ASCENDING),
+                ("likes", DESCENDING),
+                ("property_id", ASCENDING),
+            ],
+            {},
+        ),
+        (
+            [
+                ("Regionname", ASCENDING),
+                ("score", DESCENDING),
+                ("property_id", ASCENDING),
+            ],
+            {},
+        ),
+    ],
+}
+
+
+def ensure_indexes(indexes=None):
+    """
+    Create the missing indexes, existing ones are left as they are. An
+    index that cannot be built (duplicates under a unique key for
+    instance) is reported and skipped so the others still get created.
+    Returns the names of the ensured indexes.
+    """
+    indexes = indexes or INDEXES
+    created = []
+    for collection, specs in indexes.items():
+        with MongoConnectionManager(collection) as conn:
+            for keys, options in specs:
+                try:
+                    created.append(conn.create_index(keys, **options))
+                except OperationFailure as e:
+                    print(f"index {keys} on {collection} not created: {e}")
+    return created
@@ -1,8 +1,12 @@
-from fastapi import FastAPI
+import asyncio
+
+from fastapi import FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 
-from . import config
+from . import concurrency, config, database, indexes, metrics
 from .auth import routes as auth_routes
+from .concurrency import run_cpu_bound
+from .search import popularity, resources
 from .search import routes as search_routes
 
 app = FastAPI()
@@ -19,10 +23,91 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # pagination cursor of /search/, /like/ and /bookmarked/
+    expose_headers=[search_routes.NEXT_CURSOR_HEADER],
 )
+if config.read_config("metrics_enabled"):
+    app.add_middleware(metrics.MetricsMiddleware)
+
+
+warmup_task = None
+shared_watch_task = None
+
+
+def prepare_database():
+    try:
+        indexes.ensure_indexes()
+    except Exception as e:
+        print(f"ensuring indexes failed: {e!r}")
+    try:
+        count = popularity.backfill()
+    except Exception as e:
+        print(f"backfilling popularity counters failed: {e!r}")
+    else:
+        if count is not None:
+            print(f"popularity counters backfilled ({count} properties)")
+
+
+@app.on_event("startup")
+async def startup():
+    global warmup_task
+    global shared_watch_task
+    database.get_client()
+    if config.read_config("ensure_indexes_on_startup"):
+        # in the background, an unreachable database must not hold up
+        # the startup
+        asyncio.get_running_loop().run_in_executor(None, prepare_database)
+    if search_routes.is_incremental_mode():
+        search_routes.delta_writer.start()
+    if config.read_config("shared_catalog_path"):
+        shared_watch_task = asyncio.get_running_loop().create_task(
+            resources.watch_shared(run_cpu_bound)
+        )
+    if config.read_config("warmup_on_startup"):
+        # the server answers liveness probes while the model loads,
+        # readiness flips once warmup is done
+        loop = asyncio.get_running_loop()
+        warmup_task = loop.run_in_executor(None, resources.warmup)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    if shared_watch_task is not None:
+        shared_watch_task.cancel()
+    await search_routes.rebuild_scheduler.shutdown()
+    await search_routes.delta_writer.shutdown()
+    await search_routes.query_encoder.shutdown()
+    auth_routes.password_executor.shutdown()
+    concurrency.shutdown_executor()
+    database.close_client()
 
 
 @app.get("/")
 async def root():
     app_name = config.read_config("app_name")
     return {"message": f"welcome to {app_name}!"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    if not config.read_config("metrics_enabled"):
+        return Response(status_code=status.HTTP_404_NOT_FOUND)
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health/live", tags=["health"])
+async def liveness():
+    return {"status": "alive"}
+
+
+@app.get("/health/ready", tags=["health"])
+async def readiness(response: Response):
+    if warmup_task is not None and warmup_task.done():
+        error = warmup_task.exception()
+        if error is not None:
+            response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+            return {"status": "failed", "detail": repr(error)}
+    if not resources.is_ready():
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "loading"}
+    return {"status": "ready"}
@@ -0,0 +1,231 @@
+import bisect
+import re
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, Union
+
+from .config import read_config
+
+LATENCY_BUCKETS = [
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+]
+
+_registry: Dict[str, Union["Histogram", "HistogramFamily"]] = {}
+_registry_lock = threading.Lock()
+
+
+def enabled():
+    return read_config("metrics_enabled")
+
+
+class Histogram:
+    """Cumulative-bucket histogram, cheap enough for per-request use."""
+
+    def __init__(self, name, buckets, description=""):
+        self.name = name
+        self.description = description
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        position = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[position] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self.lock:
+            counts = list(self.counts)
+            count, total = self.count, self.sum
+
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = count
+        return {"buckets": buckets, "count": count, "sum": total}
+
+
+class HistogramFamily:
+    """Histograms sharing a name and buckets, one per label values."""
+
+    def __init__(self, name, buckets, description="", labelnames=()):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(
+                    values, Histogram(self.name, self.buckets)
+                )
+        return child
+
+
+def register(metric):
+    """Expose ``metric`` on ``/metrics``, returns it for chaining."""
+    with _registry_lock:
+        _registry[metric.name] = metric
+    return metric
+
+
+def _metric_name(name):
+    return re.sub(r"[^a-zA-Z0-9_:]", "_", name)
+
+
+def _label_text(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    text = ",".join(
+        '{}="{}"'.format(
+            name, str(value).replace("\\", "\\\\").replace('"', '\\"')
+        )
+        for name, value in pairs
+    )
+    return "{" + text + "}"
+
+
+def _histogram_lines(name, histogram, labelnames=(), values=()):
+    snapshot = histogram.snapshot()
+    lines = []
+    for bound, count in snapshot["buckets"].items():
+        labels = _label_text(labelnames, values, [("le", bound)])
+        lines.append(f"{name}_bucket{labels} {count}")
+    labels = _label_text(labelnames, values)
+    lines.append(f"{name}_sum{labels} {snapshot['sum']}")
+    lines.append(f"{name}_count{labels} {snapshot['count']}")
+    return lines
+
+
+def render():
+    """Every registered metric in the Prometheus text format."""
+    with _registry_lock:
+        metrics = list(_registry.values())
+
+    lines = []
+    for metric in metrics:
+        name = _metric_name(metric.name)
+        if metric.description:
+            lines.append(f"# HELP {name} {metric.description}")
+        lines.append(f"# TYPE {name} histogram")
+        if isinstance(metric, HistogramFamily):
+            for labels, child in list(metric.children.items()):
+                lines.extend(
+                    _histogram_lines(name, child, metric.labelnames, labels)
+                )
+        else:
+            lines.extend(_histogram_lines(name, metric))
+    return "\n".join(lines) + "\n"
+
+
+stage_seconds = register(
+    HistogramFamily(
+        "stage_duration_seconds",
+        LATENCY_BUCKETS,
+        "time spent in one stage of a request",
+        ("stage",),
+    )
+)
+http_request_seconds = register(
+    HistogramFamily(
+        "http_request_duration_seconds",
+        LATENCY_BUCKETS,
+        "request latency per route",
+        ("method", "route", "status"),
+    )
+)
+
+
+class _Span:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+_no_span = nullcontext()
+
+
+def span(stage):
+    """
+    ``with span("encode"):`` records the block's duration under
+    ``stage_duration_seconds``. A shared no-op when metrics are disabled.
+    """
+    if not enabled():
+        return _no_span
+    return _Span(stage_seconds.labels(stage))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request. Requests are labelled with
+    the route template (``/property/``, not the full URL), so the number
+    of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes = None
+
+    def _route_of(self, scope):
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._routes is None:
+            self._routes = {
+                route.endpoint: route.path
+                for route in scope["app"].routes
+                if hasattr(route, "endpoint")
+            }
+        return self._routes.get(endpoint, "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_request_seconds.labels(
+                scope["method"], self._route_of(scope), str(status[0])
+            ).observe(time.perf_counter() - started)
@@ -0,0 +1,222 @@
+import sys
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+CATEGORICAL_COLUMNS = (
+    "Suburb",
+    "Regionname",
+    "CouncilArea",
+    "Type",
+    "SellerG",
+    "Method",
+    "Date",
+)
+
+
+def _compact_integers(values):
+    info = np.iinfo(np.int32)
+    if len(values) and (values.min() < info.min or values.max() > info.max):
+        return values.astype(np.int64)
+    return values.astype(np.int32)
+
+
+def _compact_floats(values):
+    # float32 only when every value reads back unchanged, coordinates with
+    # five decimals for instance need float64
+    compact = values.astype(np.float32)
+    for value in np.unique(values[~np.isnan(values)]):
+        if float(str(np.float32(value))) != value:
+            return values.astype(np.float64)
+    return compact
+
+
+class StringColumn:
+    """
+    Text column packed into one UTF-8 buffer plus row offsets, so it can
+    live in a memory-mapped file instead of one Python object per row.
+    """
+
+    dtype = np.dtype(object)
+
+    def __init__(self, data, offsets, nulls=None):
+        self.data = data
+        self.offsets = offsets
+        self.nulls = nulls
+
+    @classmethod
+    def from_values(cls, values):
+        encoded = [
+            b"" if value is None else str(value).encode("utf-8")
+            for value in values
+        ]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        nulls = np.array([value is None for value in values], dtype=bool)
+        return cls(data, offsets, nulls if nulls.any() else None)
+
+    @property
+    def nbytes(self):
+        nulls = 0 if self.nulls is None else self.nulls.nbytes
+        return self.data.nbytes + self.offsets.nbytes + nulls
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        if self.nulls is not None and self.nulls[row]:
+            return None
+        start, end = self.offsets[row], self.offsets[row + 1]
+        return bytes(self.data[start:end]).decode("utf-8")
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+    def tolist(self):
+        return list(self)
+
+
+class PropertyView(Mapping):
+    """Read-only view of one catalog row, values are decoded on access."""
+
+    __slots__ = ("catalog", "row")
+
+    def __init__(self, catalog, row):
+        self.catalog = catalog
+        self.row = row
+
+    def __getitem__(self, name):
+        if name not in self.catalog.columns:
+            raise KeyError(name)
+        return self.catalog.value(self.row, name)
+
+    def __iter__(self):
+        return iter(self.catalog.column_names)
+
+    def __len__(self):
+        return len(self.catalog.column_names)
+
+
+class Catalog:
+    """
+    Read-only columnar property catalog.
+
+    Low-cardinality text columns are stored as integer codes into a sorted
+    category table, integer columns as int32 and other numbers as float32
+    when that is lossless; the remaining text columns keep one (interned)
+    Python string per row. ``id_index`` maps the string property id to its
+    row, so lookups and row views cost O(1) and never copy the catalog.
+    """
+
+    def __init__(self, column_names, columns, categories):
+        self.column_names = list(column_names)
+        self.columns = columns
+        self.categories = categories
+        self.ids = [str(property_id) for property_id in columns["id"]]
+        self.id_index = {
+            property_id: row for row, property_id in enumerate(self.ids)
+        }
+
+    @classmethod
+    def from_frame(cls, df):
+        columns, categories = {}, {}
+        for name in df.columns:
+            series = df[name]
+            if name in CATEGORICAL_COLUMNS:
+                codes, uniques = pd.factorize(series, sort=True)
+                columns[name] = codes.astype(np.int32)
+                categories[name] = np.array(
+                    [sys.intern(str(value)) for value in uniques],
+                    dtype=object,
+                )
+            elif pd.api.types.is_integer_dtype(series):
+                columns[name] = _compact_integers(series.to_numpy())
+            elif pd.api.types.is_numeric_dtype(series):
+                columns[name] = _compact_floats(
+                    series.to_numpy(dtype=np.float64)
+                )
+            else:
+                columns[name] = np.array(
+                    [
+                        sys.intern(value) if isinstance(value, str) else None
+                        for value in series
+                    ],
+                    dtype=object,
+                )
+        return cls(df.columns, columns, categories)
+
+    @classmethod
+    def from_csv(cls, path):
+        return cls.from_frame(pd.read_csv(path))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    def codes(self, name):
+        return self.columns[name], self.categories[name]
+
+    def column(self, name):
+        """Decoded values of a column (categories are looked up)."""
+        values = self.columns[name]
+        if isinstance(values, StringColumn):
+            return np.array(values.tolist(), dtype=object)
+        if name in self.categories:
+            decoded = self.categories[name][values]
+            decoded[values < 0] = None
+            return decoded
+        return values
+
+    def value(self, row, name):
+        value = self.columns[name][row]
+        if name in self.categories:
+            return self.categories[name][value] if value >= 0 else None
+        if isinstance(value, np.integer):
+            return int(value)
+        if isinstance(value, np.floating):
+            if np.isnan(value):
+                return None
+            # shortest repr, so 2.3 stored as float32 comes back as 2.3
+            return float(str(value))
+        return value
+
+    def row_of(self, property_id):
+        return self.id_index.get(str(property_id))
+
+    def view(self, row):
+        return PropertyView(self, row)
+
+    def get(self, property_id):
+        row = self.row_of(property_id)
+        return None if row is None else self.view(row)
+
+    def record(self, row):
+        """
+        The row as the ``real_estate_details`` document holds it: every
+        column, missing values as None and the id as a string.
+        """
+        record = {name: self.value(row, name) for name in self.column_names}
+        record["id"] = self.ids[row]
+        return record
+
+    def records(self, rows):
+        return [self.record(int(row)) for row in rows]
+
+    def to_frame(self):
+        return pd.DataFrame(
+            {name: self.column(name) for name in self.column_names}
+        )
+
+    def memory_usage(self):
+        total = 0
+        for name, values in self.columns.items():
+            total += values.nbytes
+            if isinstance(values, np.ndarray) and values.dtype == object:
+                total += sum(sys.getsizeof(v) for v in set(values.tolist()))
+        for values in self.categories.values():
+            total += values.nbytes + sum(sys.getsizeof(v) for v in values)
+        return total
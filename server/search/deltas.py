@@ -0,0 +1,194 @@
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+from server.config import read_config
+from server.database import AsyncMongoConnectionManager, MongoConnectionManager
+
+COLLECTION = "recommendation_deltas"
+LEASE_COLLECTION = "recommendation_writer"
+LEASE_ID = "incremental"
+
+
+async def enqueue(user_id, property_id):
+    """Note that the like of ``user_id`` on ``property_id`` changed."""
+    async with AsyncMongoConnectionManager(COLLECTION) as conn:
+        await conn.insert_one(
+            {
+                "user_id": user_id,
+                "property_id": property_id,
+                "created_at": datetime.now(timezone.utc),
+            }
+        )
+
+
+async def request_rebuild():
+    """Queue a full rebuild for the process holding the lease."""
+    async with AsyncMongoConnectionManager(COLLECTION) as conn:
+        await conn.insert_one(
+            {"rebuild": True, "created_at": datetime.now(timezone.utc)}
+        )
+
+
+def is_liked(user_id, property_id):
+    with MongoConnectionManager("collaborative_recommendation") as conn:
+        doc = conn.find_one(
+            {"user_id": user_id, "property_id": property_id}, {"_id": 1}
+        )
+    return doc is not None
+
+
+class Lease:
+    """
+    The ``recommendation_writer`` lease. Its holder is the only process
+    writing ``generated_recommendation``, be it the delta writer or a
+    full rebuild. A holder that stops renewing it for
+    ``recommendation_lease_seconds`` loses it.
+    """
+
+    def __init__(self, lease_id=LEASE_ID):
+        self.lease_id = lease_id
+        self.owner = "-".join(
+            (socket.gethostname(), str(os.getpid()), uuid.uuid4().hex)
+        )
+
+    def acquire(self):
+        """Take or renew the lease, returns whether this process owns it."""
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(
+            seconds=read_config("recommendation_lease_seconds")
+        )
+        with MongoConnectionManager(LEASE_COLLECTION) as conn:
+            try:
+                conn.find_one_and_update(
+                    {
+                        "_id": self.lease_id,
+                        "$or": [
+                            {"owner": self.owner},
+                            {"expires_at": {"$lt": now}},
+                        ],
+                    },
+                    {"$set": {"owner": self.owner, "expires_at": expires_at}},
+                    upsert=True,
+                )
+            except DuplicateKeyError:
+                # held by a live owner, the upsert collided with its lease
+                return False
+        return True
+
+    def release(self):
+        # let another process take over without waiting for the expiry
+        with MongoConnectionManager(LEASE_COLLECTION) as conn:
+            conn.delete_one({"_id": self.lease_id, "owner": self.owner})
+
+
+class DeltaWriter:
+    """
+    Single writer of the incremental recommendation updates.
+
+    Every worker queues its likes and unlikes in ``recommendation_deltas``.
+    Only the process holding the lease in ``recommendation_writer`` keeps
+    the in-memory recommender, applies the queued deltas and publishes
+    the documents, so no worker publishes from a matrix that misses likes
+    handled by another one. A delta only names the pair, the owner reads
+    whether the like exists when applying it, hence deltas may be applied
+    twice or out of order. Full rebuilds are queued the same way and run
+    by the owner between two batches, so they never overwrite documents
+    published from later deltas. An owner that stops renewing the lease
+    is replaced, the new owner loads the state from the database.
+    """
+
+    def __init__(self, apply, release, reload):
+        # apply(user_id, property_id, liked), release() drops the state,
+        # reload() loads it from the database and publishes every user
+        self.apply = apply
+        self.release = release
+        self.reload = reload
+        self.lease = Lease()
+        self.is_owner = False
+        self.applied = 0
+        self.rebuilds = 0
+        self.last_error = None
+        self._task = None
+
+    def poll(self):
+        """Apply one batch of queued deltas, returns how many."""
+        if not self.lease.acquire():
+            if self.is_owner:
+                self.is_owner = False
+                self.release()
+            return 0
+        if not self.is_owner:
+            # another owner may have applied deltas since our state was
+            # loaded, start from the database
+            self.is_owner = True
+            self.release()
+
+        with MongoConnectionManager(COLLECTION) as conn:
+            deltas = list(
+                conn.find({})
+                .sort("_id", ASCENDING)
+                .limit(read_config("recommendation_delta_batch_size"))
+            )
+            if any(delta.get("rebuild") for delta in deltas):
+                # the likes are read after every delta of the batch was
+                # queued, applying them again below changes nothing
+                self.release()
+                self.reload()
+                self.rebuilds += 1
+            pairs = dict.fromkeys(
+                (delta["user_id"], delta["property_id"])
+                for delta in deltas
+                if not delta.get("rebuild")
+            )
+            for user_id, property_id in pairs:
+                liked = is_liked(user_id, property_id)
+                self.apply(user_id, property_id, liked)
+            # deleted once applied, a crash in between applies them again
+            conn.delete_many({"_id": {"$in": [d["_id"] for d in deltas]}})
+        self.applied += len(deltas)
+        return len(deltas)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                applied = await loop.run_in_executor(None, self.poll)
+                self.last_error = None
+            except Exception as e:
+                applied = 0
+                self.last_error = repr(e)
+                print(f"applying recommendation deltas failed: {e!r}")
+            if not applied:
+                await asyncio.sleep(
+                    read_config("recommendation_delta_poll_seconds")
+                )
+
+    def start(self):
+        """Start polling, must be called from the event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    def resign(self):
+        self.lease.release()
+        self.is_owner = False
+
+    async def shutdown(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        if self.is_owner:
+            await asyncio.get_running_loop().run_in_executor(None, self.resign)
+
+    def state(self):
+        return {
+            "owner": self.lease.owner,
+            "is_owner": self.is_owner,
+            "applied": self.applied,
+            "rebuilds": self.rebuilds,
+            "last_error": self.last_error,
+        }
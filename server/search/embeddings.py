@@ -0,0 +1,189 @@
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from server.config import read_config
+
+INDEX_VERSION = 1
+EMBEDDINGS_FILE = "embeddings.npy"
+IDS_FILE = "ids.npy"
+METADATA_FILE = "metadata.json"
+
+
+class StaleIndexError(RuntimeError):
+    pass
+
+
+class EmbeddingIndex:
+    """
+    Row-normalized float32 description embeddings aligned to property ids.
+
+    Row ``i`` of ``embeddings`` belongs to ``ids[i]``, so a cosine score
+    against every property is a single matrix-vector product.
+    """
+
+    def __init__(self, embeddings, ids, metadata):
+        self.embeddings = embeddings
+        self.ids = ids
+        self.metadata = metadata
+
+    def __len__(self):
+        return len(self.ids)
+
+    def is_stale(self, df, model_name):
+        return (
+            self.metadata.get("version") != INDEX_VERSION
+            or self.metadata.get("model_name") != model_name
+            or self.metadata.get("fingerprint") != catalog_fingerprint(df)
+        )
+
+    def scores(self, query_embedding):
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        return self.embeddings @ query
+
+
+def catalog_fingerprint(df):
+    # order matters: the matrix rows follow the catalog rows
+    digest = hashlib.sha256()
+    for property_id, description in zip(df["id"], df["description"]):
+        digest.update(str(property_id).encode("utf-8"))
+        digest.update(b"\x1f")
+        digest.update(str(description).encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+def encode_descriptions(df, model, batch_size=64):
+    descriptions = [
+        "" if pd.isna(description) else str(description)
+        for description in df["description"]
+    ]
+    embeddings = model.encode(
+        descriptions,
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+    return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+
+def build_index(df, model, path=None, model_name=None):
+    path = path or read_config("embedding_index_path")
+    model_name = model_name or read_config("embedding_model_name")
+    os.makedirs(path, exist_ok=True)
+
+    embeddings = encode_descriptions(df, model)
+    ids = np.asarray([str(property_id) for property_id in df["id"]], dtype=str)
+    metadata = {
+        "version": INDEX_VERSION,
+        "model_name": model_name,
+        "fingerprint": catalog_fingerprint(df),
+        "rows": int(embeddings.shape[0]),
+        "dimension": int(embeddings.shape[1]),
+    }
+
+    # write next to the final files and swap them in, so a reader never
+    # sees a half written index
+    for name, array in ((EMBEDDINGS_FILE, embeddings), (IDS_FILE, ids)):
+        tmp_file = os.path.join(path, f".{name}.tmp")
+        with open(tmp_file, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_file, os.path.join(path, name))
+
+    tmp_file = os.path.join(path, f".{METADATA_FILE}.tmp")
+    with open(tmp_file, "w") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp_file, os.path.join(path, METADATA_FILE))
+
+    return load_index(path)
+
+
+def load_index(path=None):
+    path = path or read_config("embedding_index_path")
+    try:
+        with open(os.path.join(path, METADATA_FILE)) as f:
+            metadata = json.load(f)
+        embeddings = np.load(
+            os.path.join(path, EMBEDDINGS_FILE), mmap_mode="r"
+        )
+        ids = np.load(os.path.join(path, IDS_FILE))
+    except (OSError, ValueError):
+        return None
+
+    if embeddings.shape[0] != len(ids):
+        return None
+    return EmbeddingIndex(embeddings, ids, metadata)
+
+
+def ensure_index(df, model, path=None, model_name=None, rebuild=None):
+    """
+    Load the persisted index and make sure it matches ``df`` and the model.
+
+    A missing or stale index is rebuilt when ``rebuild`` is enabled (the
+    ``embedding_index_auto_rebuild`` setting by default), otherwise
+    ``StaleIndexError`` is raised.
+    """
+    model_name = model_name or read_config("embedding_model_name")
+    if rebuild is None:
+        rebuild = read_config("embedding_index_auto_rebuild")
+
+    index = load_index(path)
+    if index is not None and not index.is_stale(df, model_name):
+        return index
+
+    reason = "missing" if index is None else "stale"
+    if not rebuild:
+        raise StaleIndexError(
+            f"embedding index is {reason}, run "
+            "`python -m server.search.embeddings build`"
+        )
+
+    print(f"embedding index is {reason}, rebuilding")
+    return build_index(df, model, path, model_name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m server.search.embeddings",
+        description="build or verify the description embedding index",
+    )
+    parser.add_argument("command", choices=["build", "refresh", "check"])
+    parser.add_argument("--catalog", default=read_config("catalog_path"))
+    parser.add_argument("--path", default=read_config("embedding_index_path"))
+    args = parser.parse_args(argv)
+
+    df = pd.read_csv(args.catalog)
+    model_name = read_config("embedding_model_name")
+
+    if args.command == "check":
+        index = load_index(args.path)
+        if index is None:
+            print("embedding index is missing")
+            return 1
+        if index.is_stale(df, model_name):
+            print("embedding index is stale")
+            return 1
+        print(f"embedding index is up to date ({len(index)} rows)")
+        return 0
+
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name)
+    if args.command == "refresh":
+        index = ensure_index(df, model, args.path, model_name, rebuild=True)
+    else:
+        index = build_index(df, model, args.path, model_name)
+    print(f"embedding index written to {args.path} ({len(index)} rows)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,163 @@
+import numpy as np
+
+from server.config import read_config
+from server.search.vector_index import _normalize, top_k
+
+RANGE_COLUMNS = ("Rooms", "Price", "Distance", "Lattitude", "Longtitude")
+CATEGORY_COLUMNS = ("Regionname", "Type")
+
+
+def _bound(values, bound):
+    # compare in the precision of the column, as ``values >= bound`` does
+    # for a Python float, otherwise float32 values sitting on a float64
+    # bound fall on either side of it depending on the access path
+    if bound is None or not np.issubdtype(values.dtype, np.floating):
+        return bound
+    return values.dtype.type(bound)
+
+
+class AttributeIndex:
+    """
+    Per-attribute access paths over the catalog: a sorted copy of every
+    range column (rows for a range are one ``searchsorted`` away) and the
+    rows of every category value.
+    """
+
+    def __init__(self, catalog):
+        self.size = len(catalog)
+        self.values = {}
+        self.sorted = {}
+        for name in RANGE_COLUMNS:
+            values = np.asarray(catalog.columns[name])
+            # missing values sort last and never match a range
+            order = np.argsort(values, kind="stable")
+            valid = len(values)
+            if np.issubdtype(values.dtype, np.floating):
+                valid -= int(np.isnan(values).sum())
+            self.values[name] = values
+            self.sorted[name] = (values[order[:valid]], order[:valid])
+
+        self.codes = {}
+        self.postings = {}
+        for name in CATEGORY_COLUMNS:
+            codes, categories = catalog.codes(name)
+            codes = np.asarray(codes)
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(
+                codes[order], np.arange(len(categories) + 1)
+            )
+            self.codes[name] = codes
+            self.postings[name] = {
+                category: order[bounds[code] : bounds[code + 1]]
+                for code, category in enumerate(categories)
+            }
+
+    def _range_bounds(self, name, low, high):
+        values, _ = self.sorted[name]
+        low, high = _bound(values, low), _bound(values, high)
+        start = 0 if low is None else np.searchsorted(values, low, "left")
+        end = (
+            len(values)
+            if high is None
+            else np.searchsorted(values, high, "right")
+        )
+        return start, max(start, end)
+
+    def _candidates(self, ranges, categories):
+        """(size, predicate) of every filter, smallest first."""
+        candidates = []
+        for name, (low, high) in ranges.items():
+            start, end = self._range_bounds(name, low, high)
+            candidates.append((end - start, ("range", name, start, end)))
+        for name, wanted in categories.items():
+            postings = self.postings[name]
+            size = sum(len(postings.get(value, ())) for value in wanted)
+            candidates.append((size, ("category", name, wanted)))
+        candidates.sort(key=lambda candidate: candidate[0])
+        return candidates
+
+    def estimate(self, ranges, categories):
+        """Upper bound of the number of rows matching every predicate."""
+        candidates = self._candidates(ranges, categories)
+        return candidates[0][0] if candidates else self.size
+
+    def _rows_of(self, predicate):
+        if predicate[0] == "range":
+            _, name, start, end = predicate
+            return self.sorted[name][1][start:end]
+        _, name, wanted = predicate
+        postings = self.postings[name]
+        rows = [postings[value] for value in wanted if value in postings]
+        return np.concatenate(rows) if rows else np.empty(0, np.int64)
+
+    def matches(self, rows, ranges, categories):
+        """Boolean mask of the given rows that pass every predicate."""
+        mask = np.ones(len(rows), dtype=bool)
+        for name, (low, high) in ranges.items():
+            values = self.values[name][rows]
+            low, high = _bound(values, low), _bound(values, high)
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        for name, wanted in categories.items():
+            postings = self.postings[name]
+            codes = [
+                code for code, value in enumerate(postings) if value in wanted
+            ]
+            mask &= np.isin(self.codes[name][rows], codes)
+        return mask
+
+    def rows(self, ranges, categories):
+        """
+        Rows matching every predicate: start from the most selective one
+        and check the others on those rows only.
+        """
+        candidates = self._candidates(ranges, categories)
+        if not candidates:
+            return np.arange(self.size)
+        rows = self._rows_of(candidates[0][1])
+        return rows[self.matches(rows, ranges, categories)]
+
+
+def filtered_search(current, query, k, ranges, categories):
+    """
+    Top ``k`` rows by similarity among the rows passing the filters.
+
+    Selective filters are applied first and only the matching embeddings
+    are scored (pre-filtering). Broad filters go through the vector index
+    with an oversampled ``k`` and drop the misses (post-filtering), falling
+    back to pre-filtering when too few candidates survive.
+    """
+    attributes = current.attribute_index
+    if not ranges and not categories:
+        return current.search_index.search(query, k)
+
+    estimate = attributes.estimate(ranges, categories)
+    selectivity = estimate / max(attributes.size, 1)
+    if selectivity > read_config("prefilter_selectivity"):
+        wanted = k * read_config("postfilter_oversample")
+        while wanted < attributes.size // 2:
+            positions, scores = current.search_index.search(query, wanted)
+            keep = attributes.matches(positions, ranges, categories)
+            if keep.sum() >= k:
+                return positions[keep][:k], scores[keep][:k]
+            wanted *= read_config("postfilter_oversample")
+
+    # sorted rows keep the reads from the (memory-mapped) embeddings
+    # sequential
+    rows = np.sort(attributes.rows(ranges, categories))
+    scores = current.embedding_index.embeddings[rows] @ _normalize(query)
+    best = top_k(scores, k)
+    return rows[best], scores[best]
+
+
+def filtered_lexical_search(current, text, k, ranges, categories):
+    """Top ``k`` rows by BM25 score among the rows passing the filters."""
+    scores = current.text_index.scores(text)
+    rows = np.flatnonzero(scores)
+    if ranges or categories:
+        attributes = current.attribute_index
+        rows = rows[attributes.matches(rows, ranges, categories)]
+    best = top_k(scores[rows], k)
+    return rows[best], scores[rows][best]
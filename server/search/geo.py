@@ -0,0 +1,96 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat, lon, latitudes, longitudes):
+    """Great-circle distance in km from one point to many."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+    a = (
+        np.sin((latitudes - lat) / 2) ** 2
+        + np.cos(lat) * np.cos(latitudes) * np.sin((longitudes - lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _located(latitudes, longitudes):
+    """Rows that have both coordinates."""
+    return np.flatnonzero(~(np.isnan(latitudes) | np.isnan(longitudes)))
+
+
+class BruteForceGeoIndex:
+    """Scans every point, the baseline the ball tree is measured against."""
+
+    def __init__(self, latitudes, longitudes):
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.rows = _located(latitudes, longitudes)
+        self.latitudes = latitudes[self.rows]
+        self.longitudes = longitudes[self.rows]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _distances(self, lat, lon):
+        return haversine_km(lat, lon, self.latitudes, self.longitudes)
+
+    def nearest(self, lat, lon, k):
+        distances = self._distances(lat, lon)
+        k = min(k, len(distances))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        best = np.argpartition(distances, k - 1)[:k]
+        best = best[np.argsort(distances[best], kind="stable")]
+        return self.rows[best], distances[best]
+
+    def within(self, lat, lon, radius_km, limit=None):
+        distances = self._distances(lat, lon)
+        found = np.flatnonzero(distances <= radius_km)
+        found = found[np.argsort(distances[found], kind="stable")][:limit]
+        return self.rows[found], distances[found]
+
+
+class GeoIndex:
+    """
+    Ball tree over the property coordinates with the haversine metric.
+
+    Rows without coordinates are left out. ``nearest`` and ``within``
+    return catalog rows with their distance in km, closest first.
+    """
+
+    def __init__(self, latitudes, longitudes, leaf_size=40):
+        # scikit-learn is only needed once the catalog is loaded
+        from sklearn.neighbors import BallTree
+
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.rows = _located(latitudes, longitudes)
+        points = np.radians(
+            np.column_stack([latitudes[self.rows], longitudes[self.rows]])
+        )
+        self.tree = BallTree(points, leaf_size=leaf_size, metric="haversine")
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        return cls(catalog["Lattitude"], catalog["Longtitude"])
+
+    def __len__(self):
+        return len(self.rows)
+
+    def nearest(self, lat, lon, k):
+        k = min(k, len(self.rows))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        distances, found = self.tree.query(np.radians([[lat, lon]]), k=k)
+        return self.rows[found[0]], distances[0] * EARTH_RADIUS_KM
+
+    def within(self, lat, lon, radius_km, limit=None):
+        found, distances = self.tree.query_radius(
+            np.radians([[lat, lon]]),
+            r=radius_km / EARTH_RADIUS_KM,
+            return_distance=True,
+            sort_results=True,
+        )
+        found, distances = found[0][:limit], distances[0][:limit]
+        return self.rows[found], distances * EARTH_RADIUS_KM
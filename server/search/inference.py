@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+from server.concurrency import run_cpu_bound
+from server.config import read_config
+from server.metrics import Histogram, register
+
+
+class BatchEncoder:
+    """
+    Micro-batching front for a text encoder.
+
+    Concurrent ``encode`` calls are queued, collected for at most
+    ``max_wait_ms`` (or until ``max_batch_size`` texts are waiting) and
+    encoded with a single ``encode_batch`` call on the CPU pool; each
+    caller then gets its own row back. While a batch is being encoded the
+    next one keeps filling up, so batches grow with the load.
+    """
+
+    def __init__(self, encode_batch, max_batch_size=None, max_wait_ms=None):
+        self.encode_batch = encode_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.batch_size = register(
+            Histogram(
+                "inference_batch_size",
+                [1, 2, 4, 8, 16, 32, 64, 128],
+                "texts encoded per model call",
+            )
+        )
+        self.queue_wait = register(
+            Histogram(
+                "inference_queue_wait_seconds",
+                [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1],
+                "time a text waited before its batch started encoding",
+            )
+        )
+        self._queue = None
+        self._task = None
+        self._loop = None
+
+    def _get_max_batch_size(self):
+        if self.max_batch_size is None:
+            return read_config("inference_max_batch_size")
+        return self.max_batch_size
+
+    def _get_max_wait(self):
+        if self.max_wait_ms is None:
+            return read_config("inference_max_wait_ms") / 1000
+        return self.max_wait_ms / 1000
+
+    async def encode(self, text):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+
+        future = loop.create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        max_batch_size = self._get_max_batch_size()
+        deadline = time.perf_counter() + self._get_max_wait()
+        while len(batch) < max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(
+                    await asyncio.wait_for(self._queue.get(), timeout)
+                )
+            except asyncio.TimeoutError:
+                break
+        # whatever is already waiting rides along up to the batch limit
+        while len(batch) < max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            started = time.perf_counter()
+            self.batch_size.observe(len(batch))
+            for _, _, queued in batch:
+                self.queue_wait.observe(started - queued)
+
+            texts = [text for text, _, _ in batch]
+            try:
+                embeddings = await run_cpu_bound(self.encode_batch, texts)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future, _), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+
+    def state(self):
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "batch_size": self.batch_size.snapshot(),
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+        }
+
+    async def shutdown(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
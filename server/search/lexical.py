@@ -0,0 +1,174 @@
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+
+from server.search.vector_index import top_k
+
+TEXT_COLUMNS = ("description", "Suburb", "Address")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index.
+
+    Postings are stored CSR style: the rows of term ``t`` are
+    ``rows[offsets[t]:offsets[t + 1]]`` (int32, ascending) with their term
+    frequencies (uint16) alongside, a few bytes per posting instead of one
+    Python object. Added documents are buffered and merged into the arrays
+    in one pass on the next query.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.Lock()
+        self.vocabulary = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.rows = np.empty(0, dtype=np.int32)
+        self.frequencies = np.empty(0, dtype=np.uint16)
+        self.doc_lengths = np.empty(0, dtype=np.int32)
+        self.length_norms = np.empty(0, dtype=np.float32)
+        # (term, row, frequency) of the documents added since the last merge
+        self._pending = ([], [], [])
+        self._pending_lengths = []
+
+    @classmethod
+    def from_catalog(cls, catalog, columns=TEXT_COLUMNS, **kwargs):
+        index = cls(**kwargs)
+        texts = zip(*(catalog.column(name) for name in columns))
+        index.add(" ".join(value for value in row if value) for row in texts)
+        index.flush()
+        return index
+
+    def __len__(self):
+        return len(self.doc_lengths) + len(self._pending_lengths)
+
+    def add(self, texts):
+        """Append documents, their rows follow the existing ones."""
+        with self.lock:
+            terms, rows, frequencies = self._pending
+            row = len(self)
+            for text in texts:
+                counts = Counter(tokenize(text))
+                for token, count in counts.items():
+                    term = self.vocabulary.setdefault(
+                        token, len(self.vocabulary)
+                    )
+                    terms.append(term)
+                    rows.append(row)
+                    frequencies.append(min(count, np.iinfo(np.uint16).max))
+                self._pending_lengths.append(sum(counts.values()))
+                row += 1
+
+    def flush(self):
+        """Merge the buffered documents into the posting arrays."""
+        with self.lock:
+            if not self._pending_lengths:
+                return
+            terms, rows, frequencies = (
+                np.asarray(values, dtype=np.int64) for values in self._pending
+            )
+            n_terms = len(self.vocabulary)
+            old_counts = np.bincount(
+                np.repeat(
+                    np.arange(len(self.offsets) - 1), np.diff(self.offsets)
+                ),
+                minlength=n_terms,
+            )
+            new_counts = np.bincount(terms, minlength=n_terms)
+            offsets = np.zeros(n_terms + 1, dtype=np.int64)
+            np.cumsum(old_counts + new_counts, out=offsets[1:])
+
+            merged_rows = np.empty(offsets[-1], dtype=np.int32)
+            merged_frequencies = np.empty(offsets[-1], dtype=np.uint16)
+
+            # existing postings move by the new postings of earlier terms
+            old_terms = np.repeat(np.arange(n_terms), old_counts)
+            moved = np.arange(len(self.rows)) + (
+                offsets[old_terms] - self.offsets[old_terms]
+            )
+            merged_rows[moved] = self.rows
+            merged_frequencies[moved] = self.frequencies
+
+            # new rows are larger than every existing one, so they go after
+            # the existing postings of their term and the lists stay sorted
+            order = np.argsort(terms, kind="stable")
+            terms = terms[order]
+            group_starts = np.cumsum(new_counts) - new_counts
+            placed = (
+                offsets[terms]
+                + old_counts[terms]
+                + np.arange(len(terms))
+                - group_starts[terms]
+            )
+            merged_rows[placed] = rows[order]
+            merged_frequencies[placed] = frequencies[order]
+
+            self.offsets = offsets
+            self.rows = merged_rows
+            self.frequencies = merged_frequencies
+            self.doc_lengths = np.concatenate(
+                [self.doc_lengths, self._pending_lengths]
+            ).astype(np.int32)
+            average = max(float(self.doc_lengths.mean()), 1.0)
+            self.length_norms = (
+                self.k1 * (1 - self.b + self.b * self.doc_lengths / average)
+            ).astype(np.float32)
+            self._pending = ([], [], [])
+            self._pending_lengths = []
+
+    def scores(self, query):
+        """BM25 score of every document for ``query``, 0 without a match."""
+        self.flush()
+        tokens = set(tokenize(query))
+        with self.lock:
+            # a consistent set of arrays, a merge replaces all of them
+            offsets, postings = self.offsets, self.rows
+            all_frequencies, length_norms = self.frequencies, self.length_norms
+            terms = [self.vocabulary.get(token) for token in tokens]
+
+        n_docs = len(length_norms)
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for term in terms:
+            if term is None or term + 1 >= len(offsets):
+                continue
+            start, end = offsets[term], offsets[term + 1]
+            rows = postings[start:end]
+            frequencies = all_frequencies[start:end].astype(np.float32)
+            n_matches = end - start
+            idf = np.log(1 + (n_docs - n_matches + 0.5) / (n_matches + 0.5))
+            scores[rows] += (
+                idf
+                * frequencies
+                * (self.k1 + 1)
+                / (frequencies + length_norms[rows])
+            )
+        return scores
+
+    def search(self, query, k):
+        scores = self.scores(query)
+        rows = np.flatnonzero(scores)
+        best = top_k(scores[rows], k)
+        return rows[best], scores[rows][best]
+
+
+def reciprocal_rank_fusion(rankings, k, constant=60):
+    """
+    Merge several rankings (row arrays, best first): every row scores
+    ``sum(1 / (constant + rank))`` over the rankings it appears in.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            row = int(row)
+            fused[row] = fused.get(row, 0.0) + 1.0 / (constant + rank)
+    rows = sorted(fused, key=lambda row: (-fused[row], row))[:k]
+    scores = np.array([fused[row] for row in rows])
+    return np.array(rows, dtype=np.int64), scores
@@ -0,0 +1,213 @@
+import argparse
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import numpy as np
+from pymongo import ASCENDING, DESCENDING
+
+from server import indexes
+from server.config import read_config
+from server.database import AsyncMongoConnectionManager, MongoConnectionManager
+from server.search import resources
+from server.search.catalog import Catalog
+
+COLLECTION = "property_popularity"
+# likes are weighted relative to this instant, see ``log_weight``
+EPOCH = datetime(2022, 1, 1, tzinfo=timezone.utc)
+# smallest remaining fraction kept when a like is removed, so rounding
+# never takes the log of zero or of a negative number
+MIN_REMAINDER = 2.0**-52
+
+
+def log_weight(created_at=None):
+    """
+    Base-2 logarithm of the weight of a like in the decayed ``score``.
+
+    A like made at ``t`` weighs ``2 ** ((t - EPOCH) / half_life)``, so a
+    like one half-life older weighs half as much. All weights share the
+    same time origin, hence the ranking by their sum equals the ranking
+    by the decayed popularity without ever rewriting older counters.
+    ``score`` stores the logarithm of that sum: the weights themselves
+    overflow a float after about a thousand half-lives, their logarithm
+    grows linearly with time. Likes without a timestamp count as made at
+    ``EPOCH``.
+    """
+    if created_at is None:
+        return 0.0
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    half_life = read_config("popularity_half_life_days") * 86400
+    return (created_at - EPOCH).total_seconds() / half_life
+
+
+def score_update(weight, delta):
+    """
+    Update pipeline expression of ``score`` after adding (``delta=1``) or
+    removing (``delta=-1``) a like of log weight ``weight``, computed as
+    ``log2(2 ** score +/- 2 ** weight)`` without leaving log space.
+    """
+    score = "$score"
+    if delta > 0:
+        high, low = {"$max": [score, weight]}, {"$min": [score, weight]}
+        ratio = {"$pow": [2, {"$subtract": [low, high]}]}
+        combined = {"$add": [high, {"$log": [{"$add": [1, ratio]}, 2]}]}
+        return {
+            "$cond": [
+                {"$eq": [{"$ifNull": [score, None]}, None]},
+                weight,
+                combined,
+            ]
+        }
+    ratio = {"$pow": [2, {"$subtract": [weight, score]}]}
+    remainder = {"$max": [{"$subtract": [1, ratio]}, MIN_REMAINDER]}
+    return {
+        "$cond": [
+            {"$lte": [{"$ifNull": ["$likes", 0]}, 1]},
+            # the last like is gone, drop the score instead of keeping
+            # the rounding residue
+            None,
+            {"$add": [score, {"$log": [remainder, 2]}]},
+        ]
+    }
+
+
+def region_of(property_id):
+    # never load the catalog on the request path, the region is filled in
+    # by a later like or by ``rebuild``
+    if not resources.is_ready():
+        return None
+    view = resources.get_catalog().get(property_id)
+    return None if view is None else view["Regionname"]
+
+
+async def record_like(property_id, created_at=None, delta=1):
+    """Add (``delta=1``) or remove (``delta=-1``) one like."""
+    if not read_config("popularity_counters"):
+        return
+    # ``score`` reads the count before this like, ``likes`` is updated
+    # in the next stage
+    update = [
+        {"$set": {"score": score_update(log_weight(created_at), delta)}},
+        {"$set": {"likes": {"$add": [{"$ifNull": ["$likes", 0]}, delta]}}},
+    ]
+    region = region_of(property_id)
+    if region is not None:
+        update[1]["$set"]["Regionname"] = region
+    async with AsyncMongoConnectionManager(COLLECTION) as conn:
+        await conn.update_one(
+            {"property_id": property_id}, update, upsert=True
+        )
+
+
+async def top_properties(k=10, region=None, decayed=False):
+    """
+    Ids of the ``k`` most liked properties, overall or in one region.
+    Served from the counter indexes, so the cost depends on ``k`` only.
+    """
+    field = "score" if decayed else "likes"
+    # the score is a logarithm, it may be negative
+    query = {"likes": {"$gt": 0}}
+    if region is not None:
+        query["Regionname"] = region
+    async with AsyncMongoConnectionManager(COLLECTION) as conn:
+        cursor = (
+            conn.find(query, {"_id": 0, "property_id": 1})
+            .sort([(field, DESCENDING), ("property_id", ASCENDING)])
+            .limit(k)
+        )
+        return [doc["property_id"] async for doc in cursor]
+
+
+def rebuild(catalog=None):
+    """
+    Recount every property from ``collaborative_recommendation`` and swap
+    the counters in at once. Needed once to backfill, and after changing
+    ``popularity_half_life_days``.
+    """
+    likes = defaultdict(int)
+    scores = defaultdict(lambda: -np.inf)
+    with MongoConnectionManager("collaborative_recommendation") as conn:
+        projection = {"_id": 0, "property_id": 1, "created_at": 1}
+        for doc in conn.find({}, projection):
+            property_id = doc["property_id"]
+            likes[property_id] += 1
+            scores[property_id] = np.logaddexp2(
+                scores[property_id], log_weight(doc.get("created_at"))
+            )
+
+    if catalog is None:
+        regions = stored_regions(list(likes))
+    else:
+        regions = {}
+        for property_id in likes:
+            view = catalog.get(property_id)
+            if view is not None:
+                regions[property_id] = view["Regionname"]
+
+    documents = [
+        {
+            "property_id": property_id,
+            "likes": count,
+            "score": float(scores[property_id]),
+            "Regionname": regions.get(property_id),
+        }
+        for property_id, count in likes.items()
+    ]
+    if not documents:
+        with MongoConnectionManager(COLLECTION) as conn:
+            conn.drop()
+        return 0
+
+    staging_name = f"{COLLECTION}_staging_{uuid.uuid4().hex}"
+    with MongoConnectionManager(staging_name) as staging:
+        try:
+            staging.insert_many(documents, ordered=False)
+            indexes.ensure_indexes({staging_name: indexes.INDEXES[COLLECTION]})
+            staging.rename(COLLECTION, dropTarget=True)
+        except Exception:
+            staging.drop()
+            raise
+    return len(likes)
+
+
+def stored_regions(property_ids):
+    """Region of each property, as stored in real_estate_details."""
+    with MongoConnectionManager("real_estate_details") as conn:
+        cursor = conn.find(
+            {"id": {"$in": property_ids}},
+            {"_id": 0, "id": 1, "Regionname": 1},
+        )
+        return {doc["id"]: doc.get("Regionname") for doc in cursor}
+
+
+def backfill():
+    """
+    ``rebuild`` when there are no counters at all, so an existing
+    deployment does not serve short lists until someone runs the CLI.
+    Returns the number of properties counted, None when skipped.
+    """
+    if not read_config("popularity_counters"):
+        return None
+    with MongoConnectionManager(COLLECTION) as conn:
+        if conn.find_one({}, {"_id": 1}) is not None:
+            return None
+    return rebuild()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m server.search.popularity",
+        description="recount the like counters used for cold-start users",
+    )
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--catalog", default=read_config("catalog_path"))
+    args = parser.parse_args(argv)
+
+    count = rebuild(Catalog.from_csv(args.catalog))
+    print(f"popularity counters rebuilt ({count} properties)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,433 @@
+import bisect
+import threading
+from collections import defaultdict
+
+import numpy as np
+from scipy import sparse
+
+
+class Interactions:
+    """
+    Integer-coded ``(user, property)`` pairs: ``user_codes[i]`` indexes
+    ``user_ids`` and ``property_codes[i]`` indexes ``property_ids``, the
+    ids being listed in the order they first appear.
+    """
+
+    def __init__(self, user_ids, property_ids, user_codes, property_codes):
+        self.user_ids = user_ids
+        self.property_ids = property_ids
+        self.user_codes = user_codes
+        self.property_codes = property_codes
+
+    def __len__(self):
+        return len(self.user_codes)
+
+
+class SparseRecommender:
+    """
+    User-user collaborative filtering on a binary CSR user x item matrix.
+
+    Produces the same recommendations as ``utils.user_user_recs``: users
+    are ranked by dot-product similarity (ties broken by user id), and the
+    unseen items of each neighbour are taken in string order until ``m``
+    items are collected. Similarities are computed for blocks of users with
+    one sparse matrix product instead of one pandas ``dot`` per user.
+    """
+
+    def __init__(self, user_ids, property_ids, matrix):
+        self.user_ids = user_ids
+        self.property_ids = property_ids
+        self.matrix = matrix
+        self.labels = [str(property_id) for property_id in property_ids]
+        self.user_positions = {
+            user_id: position for position, user_id in enumerate(user_ids)
+        }
+        self._raw_labels = set(property_ids)
+
+    @classmethod
+    def from_frame(cls, df):
+        df = df.drop_duplicates(["property_id", "user_id"])
+        user_ids, user_codes = np.unique(
+            df["user_id"].to_numpy(), return_inverse=True
+        )
+        property_ids, property_codes = np.unique(
+            df["property_id"].to_numpy(), return_inverse=True
+        )
+
+        # columns are laid out in string order of the property ids, so the
+        # column indices of a row already are the order items get picked in
+        string_order = np.argsort(
+            np.array([str(p) for p in property_ids]), kind="stable"
+        )
+        columns = np.empty_like(string_order)
+        columns[string_order] = np.arange(len(string_order))
+
+        return cls.from_codes(
+            user_ids.tolist(),
+            property_ids[string_order].tolist(),
+            user_codes,
+            columns[property_codes],
+        )
+
+    @classmethod
+    def from_interactions(cls, interactions):
+        """Same engine as ``from_frame`` for the same pairs."""
+        user_ids = interactions.user_ids
+        property_ids = interactions.property_ids
+        user_order = sorted(range(len(user_ids)), key=user_ids.__getitem__)
+        property_order = sorted(
+            range(len(property_ids)), key=lambda code: str(property_ids[code])
+        )
+        user_rows = np.empty(len(user_ids), dtype=np.int64)
+        user_rows[user_order] = np.arange(len(user_ids))
+        columns = np.empty(len(property_ids), dtype=np.int64)
+        columns[property_order] = np.arange(len(property_ids))
+
+        return cls.from_codes(
+            [user_ids[code] for code in user_order],
+            [property_ids[code] for code in property_order],
+            user_rows[np.asarray(interactions.user_codes, dtype=np.int64)],
+            columns[np.asarray(interactions.property_codes, dtype=np.int64)],
+        )
+
+    @classmethod
+    def from_codes(cls, user_ids, property_ids, user_codes, property_codes):
+        data = np.ones(len(user_codes), dtype=np.float32)
+        matrix = sparse.csr_matrix(
+            (data, (user_codes, property_codes)),
+            shape=(len(user_ids), len(property_ids)),
+        )
+        matrix.sum_duplicates()
+        matrix.data[:] = 1
+        matrix.sort_indices()
+        return cls(user_ids, property_ids, matrix)
+
+    def _set_matrix(self, data, indices, indptr):
+        shape = (len(self.user_ids), len(self.property_ids))
+        self.matrix = sparse.csr_matrix((data, indices, indptr), shape=shape)
+        self.matrix.has_sorted_indices = True
+
+    def _insert_user(self, user_id):
+        # rows stay in user id order, ties between neighbours depend on it
+        row = bisect.bisect_left(self.user_ids, user_id)
+        self.user_ids.insert(row, user_id)
+        self.user_positions = {
+            user_id: position for position, user_id in enumerate(self.user_ids)
+        }
+        indptr = np.insert(self.matrix.indptr, row, self.matrix.indptr[row])
+        self._set_matrix(self.matrix.data, self.matrix.indices, indptr)
+        return row
+
+    def _insert_property(self, property_id, label):
+        column = bisect.bisect_left(self.labels, label)
+        self.labels.insert(column, label)
+        self.property_ids.insert(column, property_id)
+        self._raw_labels.add(property_id)
+        indices = self.matrix.indices.copy()
+        indices[indices >= column] += 1
+        self._set_matrix(self.matrix.data, indices, self.matrix.indptr)
+        return column
+
+    def column_of(self, property_id):
+        label = str(property_id)
+        column = bisect.bisect_left(self.labels, label)
+        if column < len(self.labels) and self.labels[column] == label:
+            return column
+        return None
+
+    def add_interaction(self, user_id, property_id):
+        """Mark ``property_id`` as seen by ``user_id``, growing the matrix
+        for unknown ids. Returns False when it already was."""
+        row = self.user_positions.get(user_id)
+        if row is None:
+            row = self._insert_user(user_id)
+        column = self.column_of(property_id)
+        if column is None:
+            column = self._insert_property(property_id, str(property_id))
+
+        items = self.items_of(row)
+        offset = np.searchsorted(items, column)
+        if offset < len(items) and items[offset] == column:
+            return False
+
+        position = self.matrix.indptr[row] + offset
+        indptr = self.matrix.indptr.copy()
+        indptr[row + 1 :] += 1
+        self._set_matrix(
+            np.insert(self.matrix.data, position, 1),
+            np.insert(self.matrix.indices, position, column),
+            indptr,
+        )
+        return True
+
+    def remove_interaction(self, user_id, property_id):
+        """Forget that ``user_id`` has seen ``property_id``. Users and
+        properties keep their (possibly empty) row and column. Returns
+        False when there was nothing to remove."""
+        row = self.user_positions.get(user_id)
+        column = self.column_of(property_id)
+        if row is None or column is None:
+            return False
+
+        items = self.items_of(row)
+        offset = np.searchsorted(items, column)
+        if offset == len(items) or items[offset] != column:
+            return False
+
+        position = self.matrix.indptr[row] + offset
+        indptr = self.matrix.indptr.copy()
+        indptr[row + 1 :] -= 1
+        self._set_matrix(
+            np.delete(self.matrix.data, position),
+            np.delete(self.matrix.indices, position),
+            indptr,
+        )
+        return True
+
+    def holders_of(self, column):
+        """Rows of the users that have seen ``column``."""
+        entries = np.flatnonzero(self.matrix.indices == column)
+        return np.searchsorted(self.matrix.indptr, entries, side="right") - 1
+
+    def items_of(self, row):
+        start, end = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+        return self.matrix.indices[start:end]
+
+    def neighbours(self, row, similarities):
+        """
+        Yield the other users from most to least similar.
+
+        ``similarities`` is the sparse similarity row of ``row``; users
+        sharing no item with it follow in user id order.
+        """
+        users, scores = similarities.indices, similarities.data
+        order = np.lexsort((users, -scores))
+        related = users[order]
+        yield from related[related != row]
+
+        unrelated = np.ones(len(self.user_ids), dtype=bool)
+        unrelated[users] = False
+        unrelated[row] = False
+        yield from np.flatnonzero(unrelated)
+
+    def recommend_row(self, row, similarities, m=10, visited=None):
+        """
+        Top ``m`` unseen items for ``row``. When a ``visited`` list is
+        given, every neighbour the walk inspected is appended to it.
+        """
+        blocked = np.zeros(len(self.property_ids), dtype=bool)
+        blocked[self.items_of(row)] = True
+
+        recs = []
+        last = None
+        for neighbour in self.neighbours(row, similarities):
+            if visited is not None:
+                visited.append(neighbour)
+            items = self.items_of(neighbour)
+            if not len(items):
+                continue
+            fresh = items[~blocked[items]]
+            needed = m - len(recs)
+            if len(fresh) >= needed:
+                # the item that filled the list ends the walk
+                last = fresh[needed - 1] if needed > 0 else items[0]
+                fresh = fresh[:needed]
+            else:
+                last = items[-1]
+            recs.extend(fresh.tolist())
+            blocked[fresh] = True
+            if len(recs) >= m:
+                break
+
+        recs = [self.labels[column] for column in recs]
+        # mirrors the padding step of ``user_user_recs``, which only adds
+        # the last inspected id when the column labels are not strings
+        if last is not None and len(recs) < m:
+            label = self.labels[last]
+            if label not in self._raw_labels and label not in recs:
+                recs.append(label)
+        return recs
+
+    def recommend(self, rows, m=10, block_size=512, visits=None):
+        """
+        Recommendations for the given user rows, as ``{row: recs}``. The
+        neighbours each walk inspected are stored in ``visits`` when given.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        transposed = self.matrix.T.tocsr()
+        result = {}
+        for start in range(0, len(rows), block_size):
+            block = rows[start : start + block_size]
+            similarities = (self.matrix[block] @ transposed).tocsr()
+            for offset, row in enumerate(block):
+                visited = None if visits is None else []
+                result[int(row)] = self.recommend_row(
+                    int(row), similarities[offset], m, visited
+                )
+                if visits is not None:
+                    visits[int(row)] = visited
+        return result
+
+    def popular(self, n=10):
+        """Ids of the ``n`` properties liked by the most users."""
+        columns = self.matrix.indices[: self.matrix.indptr[-1]]
+        counts = np.bincount(columns, minlength=len(self.property_ids))
+        order = np.argsort(-counts, kind="stable")[:n]
+        return [
+            self.property_ids[column] for column in order if counts[column]
+        ]
+
+    def recommend_all(self, m=10, block_size=512):
+        return self.recommend(np.arange(len(self.user_ids)), m, block_size)
+
+    def documents(self, user_ids, m=10):
+        """
+        Recommendations of every user, shaped like the
+        ``generated_recommendation`` documents, in the order of
+        ``user_ids``.
+        """
+        recs = self.recommend_all(m)
+        return [
+            {
+                "user_id": user_id,
+                "property_id": recs[self.user_positions[user_id]],
+            }
+            for user_id in user_ids
+        ]
+
+
+def recommend_all(df, m=10):
+    """
+    Recommendations for every user of an interaction frame with
+    ``user_id`` and ``property_id`` columns, in the order the users first
+    appear, shaped like the ``generated_recommendation`` documents.
+    """
+    if df.empty:
+        return []
+
+    engine = SparseRecommender.from_frame(df)
+    return engine.documents(df["user_id"].unique(), m)
+
+
+class IncrementalRecommender:
+    """
+    Keeps the user x item matrix and every user's recommendations in memory
+    and updates them one like or unlike at a time.
+
+    A change to ``(user, property)`` can only alter the recommendations of
+    the user, of the users that have seen the property (their similarity
+    to the user moved), and of the users whose neighbour walk went through
+    the user. Only those are recomputed, the rest are left untouched.
+    """
+
+    def __init__(self, engine, m=10):
+        self.engine = engine
+        self.m = m
+        self.lock = threading.RLock()
+        self.recommendations = {}
+        # user id -> ids of the users whose walk inspected it
+        self.visitors = defaultdict(set)
+        self._visited = {}
+        # users whose walk ran out of neighbours or into neighbours sharing
+        # nothing with them, a brand new user can show up there
+        self._exhausted = set()
+
+    @classmethod
+    def from_frame(cls, df, m=10):
+        state = cls(SparseRecommender.from_frame(df), m)
+        state.refresh()
+        return state
+
+    @classmethod
+    def from_interactions(cls, interactions, m=10):
+        state = cls(SparseRecommender.from_interactions(interactions), m)
+        state.refresh()
+        return state
+
+    def documents(self, user_ids=None):
+        user_ids = self.recommendations if user_ids is None else user_ids
+        return [
+            {"user_id": user_id, "property_id": self.recommendations[user_id]}
+            for user_id in user_ids
+            if user_id in self.recommendations
+        ]
+
+    def refresh(self, user_ids=None):
+        """
+        Recompute the given users (everyone by default). Returns the ids
+        that were recomputed and the ids that no longer have interactions.
+        """
+        engine = self.engine
+        if user_ids is None:
+            rows = np.arange(len(engine.user_ids))
+        else:
+            rows = np.array(
+                sorted(engine.user_positions[user_id] for user_id in user_ids),
+                dtype=np.int64,
+            )
+
+        empty = np.diff(engine.matrix.indptr)[rows] == 0
+        removed = [engine.user_ids[row] for row in rows[empty]]
+        for user_id in removed:
+            self._forget(user_id)
+            self.recommendations.pop(user_id, None)
+
+        visits = {}
+        recs = engine.recommend(rows[~empty], self.m, visits=visits)
+        updated = []
+        for row, user_recs in recs.items():
+            user_id = engine.user_ids[row]
+            self._forget(user_id)
+            visited = {engine.user_ids[neighbour] for neighbour in visits[row]}
+            for neighbour in visited:
+                self.visitors[neighbour].add(user_id)
+            self._visited[user_id] = visited
+            if len(user_recs) < self.m or self._reached_unrelated(
+                row, visits[row]
+            ):
+                self._exhausted.add(user_id)
+            self.recommendations[user_id] = user_recs
+            updated.append(user_id)
+        return updated, removed
+
+    def _forget(self, user_id):
+        for neighbour in self._visited.pop(user_id, ()):
+            self.visitors[neighbour].discard(user_id)
+        self._exhausted.discard(user_id)
+
+    def _reached_unrelated(self, row, visited):
+        if not visited:
+            return False
+        last = visited[-1]
+        items = self.engine.items_of(row)
+        return not np.intersect1d(
+            items, self.engine.items_of(last), assume_unique=True
+        ).size
+
+    def apply(self, user_id, property_id, liked=True):
+        """
+        Apply one like (or unlike) and recompute the affected users.
+        Returns ``(updated, removed)`` user ids, both empty when the
+        interaction did not change anything.
+        """
+        with self.lock:
+            engine = self.engine
+            is_new_user = user_id not in engine.user_positions
+            column = engine.column_of(property_id)
+            holders = (
+                [] if column is None else engine.holders_of(column).tolist()
+            )
+            affected = {engine.user_ids[row] for row in holders}
+
+            if liked:
+                changed = engine.add_interaction(user_id, property_id)
+            else:
+                changed = engine.remove_interaction(user_id, property_id)
+            if not changed:
+                return [], []
+
+            affected.add(user_id)
+            affected |= self.visitors.get(user_id, set())
+            if is_new_user:
+                affected |= self._exhausted
+            return self.refresh(affected)
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+from typing import Callable, List
+
+from server.config import read_config
+from server.search import (
+    embeddings,
+    filters,
+    geo,
+    lexical,
+    shared,
+    stats,
+    vector_index,
+)
+from server.search.catalog import Catalog
+
+_lock = threading.RLock()
+_model = None
+_resources = None
+_swap_listeners: List[Callable[[], None]] = []
+
+
+class SearchResources:
+    """
+    The catalog and everything derived from it. They are replaced as one
+    unit, so a request holding this object never mixes the rows of one
+    catalog version with the index of another.
+    """
+
+    def __init__(self, catalog, embedding_index, version=None):
+        self.catalog = catalog
+        self.embedding_index = embedding_index
+        self.version = version
+        self.search_index = vector_index.build_vector_index(
+            embedding_index.embeddings
+        )
+        self.stats_engine = stats.StatsEngine(catalog)
+        self.attribute_index = filters.AttributeIndex(catalog)
+        self.geo_index = geo.GeoIndex.from_catalog(catalog)
+        self.text_index = lexical.BM25Index.from_catalog(catalog)
+
+
+def get_model():
+    global _model
+    if _model is None:
+        with _lock:
+            if _model is None:
+                # importing sentence_transformers pulls in torch, so it is
+                # deferred along with the model itself
+                from sentence_transformers import SentenceTransformer
+
+                _model = SentenceTransformer(
+                    read_config("embedding_model_name")
+                )
+    return _model
+
+
+def _build_local():
+    catalog = Catalog.from_csv(read_config("catalog_path"))
+    return catalog, embeddings.ensure_index(catalog, get_model())
+
+
+def _load():
+    if not read_config("shared_catalog_path"):
+        return SearchResources(*_build_local())
+
+    version, catalog, embedding_index = shared.attach_or_publish(_build_local)
+    return SearchResources(catalog, embedding_index, version)
+
+
+def swap_shared():
+    """
+    Attach the newest shared snapshot if ``CURRENT`` moved. Returns True
+    when the resources were replaced.
+    """
+    global _resources
+    root = read_config("shared_catalog_path")
+    if not root or _resources is None:
+        return False
+
+    with _lock:
+        version = shared.current_version(root)
+        if version is None or version == _resources.version:
+            return False
+        _, catalog, embedding_index = shared.attach(root, version)
+        _resources = SearchResources(catalog, embedding_index, version)
+        print(f"attached shared catalog snapshot {version}")
+
+    for listener in _swap_listeners:
+        listener()
+    return True
+
+
+async def watch_shared(run_in_executor):
+    """Check for a new shared snapshot every
+    ``shared_catalog_poll_seconds``, swapping it in off the event loop."""
+    while True:
+        await asyncio.sleep(read_config("shared_catalog_poll_seconds"))
+        try:
+            await run_in_executor(swap_shared)
+        except Exception as e:
+            print(f"attaching shared catalog failed: {e!r}")
+
+
+def add_swap_listener(listener):
+    """Call ``listener()`` after the catalog was replaced."""
+    _swap_listeners.append(listener)
+
+
+def get_resources():
+    global _resources
+    if _resources is None:
+        with _lock:
+            if _resources is None:
+                _resources = _load()
+    return _resources
+
+
+def get_catalog():
+    return get_resources().catalog
+
+
+def get_embedding_index():
+    return get_resources().embedding_index
+
+
+def get_search_index():
+    return get_resources().search_index
+
+
+def get_stats_engine():
+    return get_resources().stats_engine
+
+
+def is_ready():
+    return _model is not None and _resources is not None
+
+
+def warmup():
+    """Load every resource and run one encode so the first request does
+    not pay for lazy initialization."""
+    get_resources()
+    get_model().encode("warmup", convert_to_numpy=True)
@@ -1,36 +1,71 @@
-import numpy as np
-import pandas as pd
-from fastapi import APIRouter, BackgroundTasks, Body
-from fastapi.encoders import jsonable_encoder
-from sentence_transformers import SentenceTransformer, util
+import json
+import threading
+from typing import List, Union
 
-from server.database import MongoConnectionManager
-from server.search import utils
+from fastapi import APIRouter, Body, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+from server import metrics
+from server.cache import TTLCache
+from server.concurrency import run_cpu_bound
+from server.config import read_config
+from server.database import AsyncMongoConnectionManager
+from server.search import (
+    deltas,
+    filters,
+    inference,
+    lexical,
+    popularity,
+    recommender,
+    resources,
+    scheduler,
+    utils,
+)
 from server.search.schemas import Like
 
 recommendation_collection_name = "collaborative_recommendation"
 gen_reco_collection_name = "generated_recommendation"
 property_collection_name = "real_estate_details"
 router = APIRouter()
+# set when a page is full, pass it back as ``after`` for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+RESPONSE_FORMAT = Query("json", alias="format", regex="^(json|ndjson)$")
+
+recommendation_state = None
+recommendation_state_lock = threading.Lock()
+# bumped to have the state reloaded, see reset_recommendation_state
+recommendation_generation = 0
+recommendation_state_generation = None
+
+
+async def check_new_user(user_id):
+    async with AsyncMongoConnectionManager(
+        recommendation_collection_name
+    ) as conn:
+        return await conn.find_one({"user_id": user_id}, {"_id": 1})
+
+
+async def read_recommendation_cards(user_id):
+    """
+    Embedded property cards of a generated recommendation document, None
+    when there is no document or it was published without cards.
+    """
+    async with AsyncMongoConnectionManager(gen_reco_collection_name) as conn:
+        doc = await conn.find_one(
+            {"user_id": user_id}, {"_id": 0, "properties": 1}
+        )
+    if doc is None or doc.get("properties") is None:
+        return None
+    return [utils.property_card(card) for card in doc["properties"]]
 
-# be very cautious to use these
-model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-train = pd.read_csv("final.csv")
-
-
-def check_new_user(user_id):
-    with MongoConnectionManager(recommendation_collection_name) as conn:
-        return list(conn.find({"user_id": user_id}))
-
-
-def read_data():
-    with MongoConnectionManager(recommendation_collection_name) as conn:
-        user__red_data = list(conn.find({}, {"_id": 0}))
-        df = pd.DataFrame(user__red_data)
-        return df
 
+async def get_user_recommendation(user_id):
+    if read_config("recommendation_cards"):
+        response = await read_recommendation_cards(user_id)
+        if response is not None:
+            return response
 
-def get_user_recommendation(user_id):
     pipeline = [
         {"$match": {"user_id": user_id}},
         {
@@ -49,22 +84,97 @@ def get_user_recommendation(user_id):
             }
         },
     ]
-    with MongoConnectionManager(gen_reco_collection_name) as conn:
-        user__red_data = list(conn.aggregate(pipeline))
-        return user__red_data[0]["result"]
+    async with AsyncMongoConnectionManager(gen_reco_collection_name) as conn:
+        cursor = conn.aggregate(pipeline)
+        user__red_data = await cursor.to_list(length=None)
+        # no document until the first rebuild after the user's first like
+        if not user__red_data:
+            return None
+        return [
+            utils.property_card(doc) for doc in user__red_data[0]["result"]
+        ]
+
+
+def encode_query(text):
+    with metrics.span("encode"):
+        return resources.get_model().encode(text, convert_to_numpy=True)
+
+
+def encode_queries(texts):
+    with metrics.span("encode"):
+        return resources.get_model().encode(texts, convert_to_numpy=True)
+
+
+query_encoder = inference.BatchEncoder(encode_queries)
+embedding_cache = TTLCache(
+    read_config("search_cache_size"), read_config("search_cache_ttl_seconds")
+)
+result_cache = TTLCache(
+    read_config("search_cache_size"), read_config("search_cache_ttl_seconds")
+)
+
+
+async def iterate(items):
+    for item in items:
+        yield item
+
+
+def ndjson_response(documents, headers=None):
+    """
+    Stream an async iterable as newline-delimited JSON, each line is sent
+    as soon as its document is available.
+    """
+
+    async def lines():
+        async for doc in documents:
+            yield json.dumps(jsonable_encoder(doc)) + "\n"
+
+    return StreamingResponse(
+        lines(), media_type="application/x-ndjson", headers=headers
+    )
+
 
+def search_offset(after):
+    # search results are ranked, not keyed, the cursor is the rank to
+    # continue from
+    if after is None:
+        return 0
+    if not after.isdigit():
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return int(after)
 
-def prepare_scores(text):
-    global train
-    global model
-    data = train.copy()
 
-    embedding_1 = model.encode(text, convert_to_tensor=True)
-    for id_n in data["id"]:
-        text2 = data.loc[data["id"] == id_n, "description"].tolist()[0]
-        embedding_2 = model.encode(text2, convert_to_tensor=True)
-        score = util.pytorch_cos_sim(embedding_1, embedding_2)
-        data.loc[data["id"] == id_n, "score"] = float(score)
+def normalize_query(text):
+    # the model is uncased, so case and spacing do not change the embedding
+    return " ".join(text.lower().split())
+
+
+async def get_query_embedding(text):
+    key = normalize_query(text)
+    query_embedding = embedding_cache.get(key)
+    if query_embedding is None:
+        query_embedding = await query_encoder.encode(key)
+        embedding_cache.set(key, query_embedding)
+    return query_embedding
+
+
+def invalidate_search_caches():
+    """Drop cached embeddings and results, call after the catalog or the
+    embedding index changed."""
+    embedding_cache.clear()
+    result_cache.clear()
+
+
+resources.add_swap_listener(invalidate_search_caches)
+
+
+def prepare_scores(text, query_embedding=None):
+    current = resources.get_resources()
+    data = current.catalog.to_frame()
+
+    if query_embedding is None:
+        query_embedding = encode_query(text)
+    data["score"] = current.embedding_index.scores(query_embedding)
 
     return data
 
@@ -73,20 +183,142 @@ def prepare_scores(text):
 # take data from collaborative_recommendation collection as dfc
 
 
+def is_incremental_mode():
+    return read_config("recommendation_mode") == "incremental"
+
+
+def reset_recommendation_state():
+    """
+    Have the in-memory state reloaded from the database on the next
+    change. Safe on the event loop: it does not wait for
+    ``recommendation_state_lock``, which a delta may hold for a full
+    reload and publish.
+    """
+    global recommendation_generation
+    recommendation_generation += 1
+
+
+def drop_recommendation_state():
+    # frees the matrix right away, blocks while a delta runs
+    global recommendation_state
+    with recommendation_state_lock:
+        recommendation_state = None
+
+
 def preperare_recommendation():
-    dfc = pd.DataFrame(utils.get_collaborative_recommendation_data())
-    user_item = utils.create_user_item_matrix(dfc)
-    li = []
     # generate recommendation for all users
-    user_id_list = dfc.user_id.unique()
-    for user_id in user_id_list:
-        recs = utils.user_user_recs(user_id, user_item, 10)
-        li.append({"user_id": user_id, "property_id": recs})
+    scheduler.rebuild_recommendations()
+    reset_recommendation_state()
 
-    utils.reupload_collaborative_recommedation_data(li)
 
+# the lease keeps a rebuild from running next to another one or next to
+# the delta writer, in any process
+rebuild_scheduler = scheduler.RebuildScheduler(
+    scheduler.rebuild_recommendations, lease=deltas.Lease()
+)
+
+
+async def request_rebuild():
+    """
+    Ask for a full rebuild. In incremental mode the delta writer holds
+    the lease, the rebuild is queued for it instead.
+    """
+    if is_incremental_mode():
+        await deltas.request_rebuild()
+    else:
+        rebuild_scheduler.request()
+
+
+def get_recommendation_state():
+    global recommendation_state
+    global recommendation_state_generation
+    with recommendation_state_lock:
+        generation = recommendation_generation
+        if (
+            recommendation_state is None
+            or recommendation_state_generation != generation
+        ):
+            state = recommender.IncrementalRecommender.from_interactions(
+                utils.stream_collaborative_recommendation_data(), 10
+            )
+            documents = state.documents()
+            if documents:
+                utils.reupload_collaborative_recommedation_data(
+                    with_property_cards(state, documents)
+                )
+            recommendation_state = state
+            recommendation_state_generation = generation
+        return recommendation_state
+
+
+def with_property_cards(state, documents):
+    """Add the cold-start document and embed the property cards."""
+    if read_config("recommendation_cards"):
+        documents.append(utils.popular_document(state.engine.popular(10)))
+        utils.add_property_cards(documents)
+    return documents
+
+
+def apply_recommendation_delta(user_id, property_id, liked=True):
+    # only called by the delta writer of the process holding the lease
+    state = get_recommendation_state()
+    # publish while holding the lock so an older delta never overwrites
+    # the documents of a newer one
+    with state.lock:
+        with metrics.span("recommendation_delta"):
+            updated, removed = state.apply(user_id, property_id, liked)
+            documents = with_property_cards(state, state.documents(updated))
+        with metrics.span("db"):
+            utils.upsert_generated_recommendations(documents, removed)
+
+
+delta_writer = deltas.DeltaWriter(
+    apply_recommendation_delta,
+    drop_recommendation_state,
+    get_recommendation_state,
+)
+
+
+async def read_property_cards(property_ids):
+    """
+    Property cards in the order of ``property_ids``, taken from the
+    catalog when it is loaded and from the database otherwise.
+    """
+    found = {}
+    if resources.is_ready():
+        catalog = resources.get_catalog()
+        for property_id in property_ids:
+            view = catalog.get(property_id)
+            if view is not None:
+                found[property_id] = utils.property_card(view)
+
+    missing = [p for p in property_ids if p not in found]
+    if missing:
+        projection = {"_id": 0, **{field: 1 for field in utils.CARD_FIELDS}}
+        async with AsyncMongoConnectionManager(
+            property_collection_name
+        ) as conn:
+            cursor = conn.find({"id": {"$in": missing}}, projection)
+            for doc in await cursor.to_list(length=None):
+                found[doc["id"]] = utils.property_card(doc)
+    return [found[p] for p in property_ids if p in found]
+
+
+async def get_new_user_recommendation():
+    if read_config("popularity_counters"):
+        top = await popularity.top_properties(
+            10, decayed=read_config("popularity_decay")
+        )
+        # fewer entries than asked for: the counters are not backfilled
+        # yet, the paths below count every like
+        if len(top) == 10:
+            return await read_property_cards(top)
+
+    if read_config("recommendation_cards"):
+        response = await read_recommendation_cards(utils.POPULAR_USER_ID)
+        if response is not None:
+            return response
 
-def get_new_user_recommendation():
     pipeline = [
         {"$group": {"_id": "$property_id", "count": {"$sum": 1}}},
         {"$sort": {"count": -1}},
@@ -102,102 +334,397 @@ def get_new_user_recommendation():
         {"$project": {"count": 0, "result._id": 0}},
     ]
     # get data from mongodb
-    with MongoConnectionManager(recommendation_collection_name) as conn:
-        user__red_data = list(conn.aggregate(pipeline))
-
-    response = [doc["result"][0] for doc in user__red_data]
+    async with AsyncMongoConnectionManager(
+        recommendation_collection_name
+    ) as conn:
+        cursor = conn.aggregate(pipeline)
+        user__red_data = await cursor.to_list(length=None)
+
+    response = [
+        utils.property_card(doc["result"][0])
+        for doc in user__red_data
+        if doc["result"]
+    ]
     return response
 
 
+def search_properties(
+    text,
+    k,
+    query_embedding=None,
+    ranges=None,
+    categories=None,
+    mode="semantic",
+):
+    current = resources.get_resources()
+    ranges, categories = ranges or {}, categories or {}
+    if query_embedding is None and mode != "lexical":
+        query_embedding = encode_query(text)
+    # the indexes select the top k while scoring, so sorting is part of
+    # the score stage
+    with metrics.span("score"):
+        positions = rank_properties(
+            current, text, k, query_embedding, ranges, categories, mode
+        )
+    with metrics.span("records"):
+        return current.catalog.records(positions)
+
+
+def rank_properties(
+    current, text, k, query_embedding, ranges, categories, mode
+):
+    if mode == "lexical":
+        positions, _ = filters.filtered_lexical_search(
+            current, text, k, ranges, categories
+        )
+        return positions
+    if mode == "semantic":
+        positions, _ = filters.filtered_search(
+            current, query_embedding, k, ranges, categories
+        )
+        return positions
+
+    # hybrid: fuse the leading rows of both rankings by their ranks, the
+    # two scores are not on comparable scales
+    n_candidates = max(k, read_config("hybrid_candidates"))
+    semantic, _ = filters.filtered_search(
+        current, query_embedding, n_candidates, ranges, categories
+    )
+    keyword, _ = filters.filtered_lexical_search(
+        current, text, n_candidates, ranges, categories
+    )
+    positions, _ = lexical.reciprocal_rank_fusion(
+        [semantic, keyword], k, read_config("hybrid_rrf_k")
+    )
+    return positions
+
+
+def compute_statistics(
+    text,
+    query_embedding=None,
+    min_score=0.1,
+    types=None,
+    price_min=None,
+    price_max=None,
+):
+    current = resources.get_resources()
+    scores = None
+    if min_score is not None:
+        if query_embedding is None:
+            query_embedding = encode_query(text)
+        with metrics.span("score"):
+            scores = current.embedding_index.scores(query_embedding)
+
+    with metrics.span("statistics"):
+        return current.stats_engine.query(
+            scores, min_score, types, (price_min, price_max)
+        )
+
+
 @router.get("/search/", tags=["search"])
-async def get_prediction(text: str):
-    data = prepare_scores(text)
-    result = (
-        data.sort_values("score", ascending=False)
-        .drop(columns="score")
-        .head(10)
-        .to_dict("records")
+async def get_prediction(
+    text: str,
+    response: Response,
+    k: int = Query(10, ge=1, le=100),
+    rooms_min: Union[int, None] = None,
+    rooms_max: Union[int, None] = None,
+    price_min: Union[float, None] = None,
+    price_max: Union[float, None] = None,
+    distance_min: Union[float, None] = None,
+    distance_max: Union[float, None] = None,
+    lat_min: Union[float, None] = None,
+    lat_max: Union[float, None] = None,
+    lon_min: Union[float, None] = None,
+    lon_max: Union[float, None] = None,
+    region: Union[List[str], None] = Query(None),
+    property_type: Union[List[str], None] = Query(None, alias="type"),
+    mode: str = Query("semantic", regex="^(semantic|lexical|hybrid)$"),
+    limit: Union[int, None] = Query(None, ge=1, le=100),
+    after: Union[str, None] = None,
+    response_format: str = RESPONSE_FORMAT,
+):
+    # ranking the next page means ranking every row before it too, so
+    # pages end at search_max_depth
+    offset = search_offset(after)
+    depth = min(offset + (limit or k), read_config("search_max_depth"))
+    bounds = {
+        "Rooms": (rooms_min, rooms_max),
+        "Price": (price_min, price_max),
+        "Distance": (distance_min, distance_max),
+        "Lattitude": (lat_min, lat_max),
+        "Longtitude": (lon_min, lon_max),
+    }
+    ranges = {
+        name: bound
+        for name, bound in bounds.items()
+        if any(value is not None for value in bound)
+    }
+    categories = {}
+    if region:
+        categories["Regionname"] = frozenset(region)
+    if property_type:
+        categories["Type"] = frozenset(property_type)
+
+    key = (
+        "search",
+        mode,
+        normalize_query(text),
+        depth,
+        tuple(sorted(ranges.items())),
+        tuple(
+            (name, tuple(sorted(values)))
+            for name, values in sorted(categories.items())
+        ),
     )
-    return jsonable_encoder(result)
+    result = result_cache.get(key)
+    if result is None:
+        query_embedding = None
+        if mode != "lexical":
+            query_embedding = await get_query_embedding(text)
+        result = await run_cpu_bound(
+            search_properties,
+            text,
+            depth,
+            query_embedding,
+            ranges,
+            categories,
+            mode,
+        )
+        result = jsonable_encoder(result)
+        result_cache.set(key, result)
+
+    headers = {}
+    if len(result) == depth and depth < read_config("search_max_depth"):
+        headers[NEXT_CURSOR_HEADER] = str(depth)
+    page = result[offset:depth]
+    if response_format == "ndjson":
+        return ndjson_response(iterate(page), headers)
+    response.headers.update(headers)
+    return page
 
 
 @router.get("/stats/", tags=["search"])
-async def get_statistics(text: str):
-    data = prepare_scores(text)
-    data = data[data["score"] > 0.1]
-
-    fields = ["Price", "Landsize", "Rooms"]
-    index = ["Regionname"]
-    aggregations = [np.mean, np.max, np.min, np.std]
-
-    response = {}
-    for field in fields:
-        res = pd.pivot_table(
-            data, values=field, index=index, aggfunc=aggregations, margins=True
+async def get_statistics(
+    text: str,
+    min_score: Union[float, None] = 0.1,
+    property_type: Union[List[str], None] = Query(None, alias="type"),
+    price_min: Union[float, None] = None,
+    price_max: Union[float, None] = None,
+):
+    types = tuple(sorted(property_type)) if property_type else None
+    # without a score threshold the text does not change the result
+    query = normalize_query(text) if min_score is not None else None
+    key = ("stats", query, min_score, types, price_min, price_max)
+    response = result_cache.get(key)
+    if response is None:
+        query_embedding = None
+        if min_score is not None:
+            query_embedding = await get_query_embedding(text)
+        response = await run_cpu_bound(
+            compute_statistics,
+            text,
+            query_embedding,
+            min_score,
+            types,
+            price_min,
+            price_max,
         )
-
-        res = res.droplevel(1, axis=1)
-        res = res.round(2).replace({np.nan: None, pd.NA: None})
-        response[field] = res.to_dict(orient="index")
+        result_cache.set(key, response)
     return response
 
 
+def find_nearby(current, lat, lon, k, radius_km=None, exclude=None):
+    # one extra row in case the reference property itself is found
+    limit = k if exclude is None else k + 1
+    with metrics.span("geo"):
+        if radius_km is None:
+            rows, distances = current.geo_index.nearest(lat, lon, limit)
+        else:
+            rows, distances = current.geo_index.within(
+                lat, lon, radius_km, limit
+            )
+
+    response = []
+    for row, distance in zip(rows, distances):
+        if row == exclude:
+            continue
+        record = current.catalog.record(int(row))
+        record["distance_km"] = round(float(distance), 3)
+        response.append(record)
+    return response[:k]
+
+
+def nearby_properties(lat, lon, property_id, k, radius_km=None):
+    # the same resources for the lookup and the search, a swap in between
+    # would change what the row means
+    current = resources.get_resources()
+    catalog = current.catalog
+    exclude = None
+    if property_id is not None:
+        exclude = catalog.row_of(property_id)
+        if exclude is None:
+            raise HTTPException(status_code=404, detail="property not found")
+        lat = catalog.value(exclude, "Lattitude")
+        lon = catalog.value(exclude, "Longtitude")
+        if lat is None or lon is None:
+            raise HTTPException(
+                status_code=400, detail="property has no coordinates"
+            )
+    return find_nearby(current, lat, lon, k, radius_km, exclude)
+
+
+@router.get("/nearby/", tags=["search"])
+async def get_nearby_properties(
+    lat: Union[float, None] = Query(None, ge=-90, le=90),
+    lon: Union[float, None] = Query(None, ge=-180, le=180),
+    property_id: Union[str, None] = None,
+    k: int = Query(10, ge=1, le=100),
+    radius_km: Union[float, None] = Query(None, gt=0),
+):
+    if property_id is None and (lat is None or lon is None):
+        raise HTTPException(
+            status_code=400, detail="pass lat and lon or a property_id"
+        )
+    # the lookup needs the catalog, which may still be loading
+    return await run_cpu_bound(
+        nearby_properties, lat, lon, property_id, k, radius_km
+    )
+
+
 @router.get("/recommendation/", tags=["machine learning"])
-async def get_recommendation(user_id: str, background_tasks: BackgroundTasks):
+async def get_recommendation(user_id: str):
     # check new user or old user
-    # if new user do ranking based recommendation
-    if not check_new_user(user_id):
-        response = get_new_user_recommendation()
-    else:
-        # else do collaborative recommendation
-        response = get_user_recommendation(user_id)
-
-    background_tasks.add_task(preperare_recommendation)
+    # if old user do collaborative recommendation
+    response = None
+    if await check_new_user(user_id):
+        response = await get_user_recommendation(user_id)
+    # new users, and users without recommendations yet, get the ranking
+    # based recommendation
+    if response is None:
+        response = await get_new_user_recommendation()
+
+    # incremental mode keeps the documents current on every like/unlike
+    if not is_incremental_mode():
+        rebuild_scheduler.request()
     return response
 
 
+@router.get("/popular/", tags=["machine learning"])
+async def get_popular_properties(
+    k: int = Query(10, ge=1, le=100),
+    region: Union[str, None] = None,
+    decayed: Union[bool, None] = None,
+):
+    if decayed is None:
+        decayed = read_config("popularity_decay")
+    top = await popularity.top_properties(k, region, decayed)
+    return await read_property_cards(top)
+
+
 @router.post("/recommendation/", tags=["machine learning"])
-async def update_recommendation(background_tasks: BackgroundTasks):
-    background_tasks.add_task(preperare_recommendation)
+async def update_recommendation():
+    await request_rebuild()
     return {"message": "recommendation calculation in progress"}
 
 
-@router.get("/like/", tags=["property"])
-async def read_liked_property(user_id: str):
-    response = utils.read_like_record(user_id)
+@router.get("/admin/recommendation/", tags=["admin"])
+async def read_recommendation_rebuild_state():
+    response = rebuild_scheduler.state()
+    response["delta_writer"] = delta_writer.state()
     return response
 
 
+@router.get("/admin/inference/", tags=["admin"])
+async def read_inference_state():
+    return query_encoder.state()
+
+
+@router.get("/admin/cache/", tags=["admin"])
+async def read_search_cache_state():
+    return {
+        "embeddings": embedding_cache.stats(),
+        "results": result_cache.stats(),
+    }
+
+
+@router.get("/like/", tags=["property"])
+async def read_liked_property(
+    user_id: str,
+    response: Response,
+    limit: Union[int, None] = Query(None, ge=1, le=1000),
+    after: Union[str, None] = None,
+    response_format: str = RESPONSE_FORMAT,
+):
+    if response_format == "ndjson":
+        property_ids = utils.iter_liked_property_ids(user_id, limit, after)
+        return ndjson_response(
+            {"property_id": property_id} async for property_id in property_ids
+        )
+
+    data = await utils.read_like_record(user_id, limit, after)
+    if limit and len(data["property_id"]) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = data["property_id"][-1]
+    return data
+
+
 @router.post("/like/", tags=["property"])
-async def user_liked_property(data: Like, background_tasks: BackgroundTasks):
-    success = utils.create_like_record(data.user_id, data.property_id)
+async def user_liked_property(data: Like):
+    success = await utils.create_like_record(data.user_id, data.property_id)
     if success:
         response = {"success": True, "message": "reaction stored"}
     else:
         response = {"success": False, "message": "unique constraint failed"}
 
-    background_tasks.add_task(preperare_recommendation)
+    if is_incremental_mode():
+        await deltas.enqueue(data.user_id, data.property_id)
+    else:
+        rebuild_scheduler.request()
     return response
 
 
 @router.delete("/like/", tags=["property"])
 async def user_disliked_property(data: Like = Body()):
-    success = utils.delete_like_record(data.user_id, data.property_id)
+    success = await utils.delete_like_record(data.user_id, data.property_id)
     if success:
         response = {"success": True, "message": "reaction deleted"}
     else:
         response = {"success": False, "message": "something went wrong"}
 
+    if is_incremental_mode():
+        await deltas.enqueue(data.user_id, data.property_id)
     return response
 
 
 @router.get("/property/", tags=["property"])
 async def read_property_details(property_id: str):
-    response = utils.read_single_property_data(property_id)
+    # loading the catalog blocks, until warmup is done read from the
+    # database instead
+    if resources.is_ready():
+        catalog = resources.get_catalog()
+        row = catalog.row_of(property_id)
+        if row is not None:
+            return catalog.record(row)
+
+    response = await utils.read_single_property_data(property_id)
     return response
 
 
 @router.get("/bookmarked/", tags=["property"])
-async def read_used_likes(user_id: str):
-    response = utils.read_liked_property_details(user_id)
-    return response
+async def read_used_likes(
+    user_id: str,
+    response: Response,
+    limit: Union[int, None] = Query(None, ge=1, le=1000),
+    after: Union[str, None] = None,
+    response_format: str = RESPONSE_FORMAT,
+):
+    if response_format == "ndjson":
+        return ndjson_response(
+            utils.iter_liked_property_details(user_id, limit, after)
+        )
+
+    # the cursor follows the likes, a property missing from
+    # real_estate_details must not end the pages early
+    property_ids = await utils.read_liked_property_ids(user_id, limit, after)
+    if limit and len(property_ids) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = property_ids[-1]
+    return await utils.read_property_details(property_ids)
@@ -0,0 +1,191 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from server import metrics
+from server.config import read_config
+from server.search import recommender, utils
+
+rebuild_seconds = metrics.register(
+    metrics.HistogramFamily(
+        "recommendation_rebuild_duration_seconds",
+        [1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800],
+        "full recommendation rebuilds, queueing window excluded",
+        ("result",),
+    )
+)
+
+
+def rebuild_recommendations():
+    """Recompute every user's recommendations and republish them."""
+    interactions = utils.stream_collaborative_recommendation_data()
+    if not len(interactions):
+        return 0
+
+    engine = recommender.SparseRecommender.from_interactions(interactions)
+    li = engine.documents(interactions.user_ids, 10)
+    n_users = len(li)
+    if read_config("recommendation_cards"):
+        li.append(utils.popular_document(engine.popular(10)))
+        utils.add_property_cards(li)
+    utils.reupload_collaborative_recommedation_data(li)
+    return n_users
+
+
+class RebuildScheduler:
+    """
+    Debounced, single-flight runner for an expensive rebuild job.
+
+    ``request`` only marks a rebuild as pending. Requests arriving within
+    ``window`` seconds are coalesced into one run, at most one run is in
+    flight at a time, and requests made during a run schedule exactly one
+    follow-up run. The job itself runs in a dedicated worker process so
+    it never blocks the event loop.
+
+    With a ``lease`` (see ``deltas.Lease``) a run only starts once the
+    lease is held, and keeps renewing it until the job returns, so at
+    most one run is in flight across every process. A request that finds
+    the lease taken stays pending and is retried after the window.
+    """
+
+    def __init__(self, job, window=None, on_complete=None, lease=None):
+        self.job = job
+        self.window = window
+        self.on_complete = on_complete
+        self.lease = lease
+        self.pending = False
+        self.running = False
+        self.requests = 0
+        self.runs = 0
+        self.failures = 0
+        self.lease_busy = 0
+        self.last_requested = None
+        self.last_started = None
+        self.last_finished = None
+        self.last_duration = None
+        self.last_result = None
+        self.last_error = None
+        self._task = None
+        self._executor = None
+
+    def _get_window(self):
+        if self.window is None:
+            return read_config("recommendation_rebuild_window")
+        return self.window
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn, so the worker does not inherit the model, the catalog
+            # or open database sockets from the server process
+            self._executor = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def request(self):
+        """Ask for a rebuild, must be called from the event loop."""
+        self.requests += 1
+        self.last_requested = time.time()
+        self.pending = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._drain())
+
+    async def _acquire_lease(self, loop):
+        if self.lease is None:
+            return True
+        try:
+            acquired = await loop.run_in_executor(None, self.lease.acquire)
+        except Exception as e:
+            print(f"taking the rebuild lease failed: {e!r}")
+            acquired = False
+        if not acquired:
+            self.lease_busy += 1
+        return acquired
+
+    async def _release_lease(self, loop):
+        if self.lease is None:
+            return
+        try:
+            await loop.run_in_executor(None, self.lease.release)
+        except Exception as e:
+            # the lease expires on its own
+            print(f"releasing the rebuild lease failed: {e!r}")
+
+    async def _run_job(self, loop):
+        future = loop.run_in_executor(self._get_executor(), self.job)
+        if self.lease is None:
+            return await future
+        # a rebuild may take longer than the lease, renew it meanwhile
+        renew_every = read_config("recommendation_lease_seconds") / 3
+        while True:
+            done, _ = await asyncio.wait({future}, timeout=renew_every)
+            if done:
+                return future.result()
+            try:
+                renewed = await loop.run_in_executor(None, self.lease.acquire)
+            except Exception as e:
+                renewed = False
+                print(f"renewing the rebuild lease failed: {e!r}")
+            if not renewed:
+                print("the rebuild lease may be lost, rebuilding anyway")
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        while self.pending:
+            await asyncio.sleep(self._get_window())
+            if not await self._acquire_lease(loop):
+                # another process is rebuilding, run after it since it
+                # may have read the likes before this request
+                continue
+            self.pending = False
+            self.running = True
+            self.last_started = time.time()
+            started = time.perf_counter()
+            try:
+                self.last_result = await self._run_job(loop)
+                self.last_error = None
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    # a crashed worker poisons the pool, start a fresh one
+                    self._executor = None
+                self.failures += 1
+                self.last_error = repr(e)
+                print(f"recommendation rebuild failed: {e!r}")
+            finally:
+                await self._release_lease(loop)
+                self.running = False
+                self.runs += 1
+                self.last_duration = time.perf_counter() - started
+                self.last_finished = time.time()
+                result = "ok" if self.last_error is None else "error"
+                rebuild_seconds.labels(result).observe(self.last_duration)
+
+            if self.on_complete is not None and self.last_error is None:
+                self.on_complete()
+
+    def state(self):
+        return {
+            "pending": self.pending,
+            "running": self.running,
+            "window_seconds": self._get_window(),
+            "requests": self.requests,
+            "runs": self.runs,
+            "failures": self.failures,
+            "lease_busy": self.lease_busy,
+            "last_requested": self.last_requested,
+            "last_started": self.last_started,
+            "last_finished": self.last_finished,
+            "last_duration_seconds": self.last_duration,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+        }
+
+    async def shutdown(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
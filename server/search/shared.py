@@ -0,0 +1,185 @@
+import argparse
+import fcntl
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from server.config import read_config
+from server.search import embeddings
+from server.search.catalog import Catalog, StringColumn
+
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = ".lock"
+CATALOG_DIR = "catalog"
+MANIFEST_FILE = "manifest.json"
+
+
+def _save(path, array):
+    with open(path, "wb") as f:
+        np.save(f, np.ascontiguousarray(array))
+
+
+def _write_catalog(catalog, path):
+    os.makedirs(path)
+    manifest = {"column_names": catalog.column_names, "columns": {}}
+    for name in catalog.column_names:
+        values = catalog.columns[name]
+        entry = {}
+        if name in catalog.categories:
+            entry["categories"] = catalog.categories[name].tolist()
+        if isinstance(values, StringColumn) or values.dtype == object:
+            if not isinstance(values, StringColumn):
+                values = StringColumn.from_values(values)
+            entry["kind"] = "strings"
+            _save(os.path.join(path, f"{name}.data.npy"), values.data)
+            _save(os.path.join(path, f"{name}.offsets.npy"), values.offsets)
+            if values.nulls is not None:
+                _save(os.path.join(path, f"{name}.nulls.npy"), values.nulls)
+                entry["nulls"] = True
+        else:
+            entry["kind"] = "array"
+            _save(os.path.join(path, f"{name}.npy"), values)
+        manifest["columns"][name] = entry
+
+    with open(os.path.join(path, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f)
+
+
+def _read_catalog(path):
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+
+    def load(name):
+        return np.load(os.path.join(path, name), mmap_mode="r")
+
+    columns, categories = {}, {}
+    for name, entry in manifest["columns"].items():
+        if entry["kind"] == "strings":
+            nulls = load(f"{name}.nulls.npy") if entry.get("nulls") else None
+            columns[name] = StringColumn(
+                load(f"{name}.data.npy"), load(f"{name}.offsets.npy"), nulls
+            )
+        else:
+            columns[name] = load(f"{name}.npy")
+        if "categories" in entry:
+            categories[name] = np.array(entry["categories"], dtype=object)
+    return Catalog(manifest["column_names"], columns, categories)
+
+
+def current_version(root):
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def publish(catalog, embedding_index, root=None, keep=2):
+    """
+    Write the catalog and its embeddings as a new memory-mappable snapshot
+    under ``root`` and point ``CURRENT`` at it.
+
+    Workers attach snapshots read-only, so the page cache holds a single
+    copy of the data whatever the number of workers. The ``keep`` newest
+    snapshots are kept; workers still mapping a deleted one keep working
+    until they swap.
+    """
+    root = root or read_config("shared_catalog_path")
+    os.makedirs(root, exist_ok=True)
+    fingerprint = embedding_index.metadata["fingerprint"]
+    version = f"{int(time.time() * 1000)}-{fingerprint[:12]}"
+    staging = os.path.join(root, f".{version}.tmp")
+
+    _write_catalog(catalog, os.path.join(staging, CATALOG_DIR))
+    _save(
+        os.path.join(staging, embeddings.EMBEDDINGS_FILE),
+        embedding_index.embeddings,
+    )
+    _save(os.path.join(staging, embeddings.IDS_FILE), embedding_index.ids)
+    with open(os.path.join(staging, embeddings.METADATA_FILE), "w") as f:
+        json.dump(embedding_index.metadata, f, indent=2)
+    os.rename(staging, os.path.join(root, version))
+
+    tmp_file = os.path.join(root, f".{CURRENT_FILE}.tmp")
+    with open(tmp_file, "w") as f:
+        f.write(version)
+    os.replace(tmp_file, os.path.join(root, CURRENT_FILE))
+
+    versions = sorted(
+        name
+        for name in os.listdir(root)
+        if not name.startswith(".") and name != CURRENT_FILE
+    )
+    for name in versions[:-keep]:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    return version
+
+
+def attach(root=None, version=None):
+    """Map a published snapshot, returns ``(version, catalog, index)``."""
+    root = root or read_config("shared_catalog_path")
+    version = version or current_version(root)
+    if version is None:
+        return None
+
+    path = os.path.join(root, version)
+    catalog = _read_catalog(os.path.join(path, CATALOG_DIR))
+    embedding_index = embeddings.load_index(path)
+    if embedding_index is None:
+        raise RuntimeError(f"shared snapshot {version} has no embeddings")
+    return version, catalog, embedding_index
+
+
+def attach_or_publish(build, root=None):
+    """
+    Attach the current snapshot, publishing one from ``build()`` (which
+    returns ``(catalog, embedding_index)``) when there is none yet. A file
+    lock makes sure only one worker builds it.
+    """
+    root = root or read_config("shared_catalog_path")
+    attached = attach(root)
+    if attached is not None:
+        return attached
+
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, LOCK_FILE), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if current_version(root) is None:
+                publish(*build(), root)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    return attach(root)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m server.search.shared",
+        description="publish the catalog and embeddings for all workers",
+    )
+    parser.add_argument("command", choices=["publish", "status"])
+    parser.add_argument("--catalog", default=read_config("catalog_path"))
+    parser.add_argument("--path", default=read_config("shared_catalog_path"))
+    args = parser.parse_args(argv)
+    if not args.path:
+        parser.error("set shared_catalog_path or pass --path")
+
+    if args.command == "status":
+        print(f"current snapshot: {current_version(args.path)}")
+        return 0
+
+    from sentence_transformers import SentenceTransformer
+
+    catalog = Catalog.from_csv(args.catalog)
+    model = SentenceTransformer(read_config("embedding_model_name"))
+    embedding_index = embeddings.ensure_index(catalog, model, rebuild=True)
+    version = publish(catalog, embedding_index, args.path)
+    print(f"published snapshot {version} ({len(catalog)} properties)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
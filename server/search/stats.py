@@ -0,0 +1,149 @@
+import numpy as np
+
+STAT_FIELDS = ("Price", "Landsize", "Rooms")
+# names the pivot table used to give the aggregations
+STAT_NAMES = ("mean", "amax", "amin", "std")
+MARGIN_NAME = "All"
+
+
+class GroupStats:
+    """Per-group sufficient statistics, one column per field."""
+
+    def __init__(self, count, total, squares, minimum, maximum):
+        self.count = count
+        self.total = total
+        self.squares = squares
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def margin(self):
+        return GroupStats(
+            self.count.sum(axis=0, keepdims=True),
+            self.total.sum(axis=0, keepdims=True),
+            self.squares.sum(axis=0, keepdims=True),
+            self.minimum.min(axis=0, keepdims=True),
+            self.maximum.max(axis=0, keepdims=True),
+        )
+
+
+class StatsEngine:
+    """
+    Mean/max/min/std of the stat fields per ``Regionname``, computed in one
+    grouped pass over the catalog columns.
+
+    Values are stored shifted by the catalog mean of each field so the
+    sum-of-squares variance does not lose precision on large prices. The
+    unfiltered statistics are precomputed; filtered requests only
+    aggregate the matching rows.
+    """
+
+    def __init__(self, catalog, fields=STAT_FIELDS, group_by="Regionname"):
+        self.fields = list(fields)
+        codes, groups = catalog.codes(group_by)
+        self.codes = codes
+        self.groups = list(groups)
+        self.is_integer = [
+            np.issubdtype(catalog[field].dtype, np.integer)
+            for field in self.fields
+        ]
+
+        values = np.column_stack(
+            [catalog[field].astype(np.float64) for field in self.fields]
+        )
+        self.valid = ~np.isnan(values)
+        self.shift = np.nanmean(values, axis=0)
+        self.values = np.where(self.valid, values - self.shift, 0.0)
+
+        self.type_codes, self.type_names = catalog.codes("Type")
+        self.prices = catalog["Price"].astype(np.float64)
+        self.totals = self.aggregate(np.flatnonzero(codes >= 0))
+
+    def aggregate(self, rows):
+        n_groups, n_fields = len(self.groups), len(self.fields)
+        rows = rows[self.codes[rows] >= 0]
+        valid = self.valid[rows]
+
+        # flattened (group, field) bins so every field is reduced in the
+        # same bincount call
+        bins = self.codes[rows, None] * n_fields + np.arange(n_fields)
+        bins, values = bins[valid], self.values[rows][valid]
+        size = n_groups * n_fields
+        shape = (n_groups, n_fields)
+
+        count = np.bincount(bins, minlength=size).reshape(shape)
+        total = np.bincount(bins, weights=values, minlength=size)
+        squares = np.bincount(bins, weights=values**2, minlength=size)
+        minimum = np.full(size, np.inf)
+        maximum = np.full(size, -np.inf)
+        np.minimum.at(minimum, bins, values)
+        np.maximum.at(maximum, bins, values)
+
+        return GroupStats(
+            count,
+            total.reshape(shape),
+            squares.reshape(shape),
+            minimum.reshape(shape),
+            maximum.reshape(shape),
+        )
+
+    def mask(self, scores=None, min_score=None, types=None, price_range=None):
+        mask = self.codes >= 0
+        if scores is not None and min_score is not None:
+            mask &= scores > min_score
+        if types:
+            wanted = np.flatnonzero(np.isin(self.type_names, list(types)))
+            mask &= np.isin(self.type_codes, wanted)
+        if price_range is not None:
+            low, high = price_range
+            if low is not None:
+                mask &= self.prices >= low
+            if high is not None:
+                mask &= self.prices <= high
+        return mask
+
+    def query(self, scores=None, min_score=None, types=None, price_range=None):
+        price_range = price_range or (None, None)
+        filtered = (
+            (scores is not None and min_score is not None)
+            or bool(types)
+            or any(bound is not None for bound in price_range)
+        )
+        if not filtered:
+            return self.summarize(self.totals)
+
+        rows = np.flatnonzero(self.mask(scores, min_score, types, price_range))
+        return self.summarize(self.aggregate(rows))
+
+    def summarize(self, stats):
+        tables = [(label, stats, row) for row, label in enumerate(self.groups)]
+        tables.append((MARGIN_NAME, stats.margin(), 0))
+
+        response = {}
+        for column, field in enumerate(self.fields):
+            response[field] = {
+                label: self._describe(group_stats, row, column)
+                for label, group_stats, row in tables
+                if group_stats.count[row, column]
+            }
+        return response
+
+    def _describe(self, stats, row, column):
+        count = stats.count[row, column]
+        total = stats.total[row, column]
+        shift = self.shift[column]
+        shifted_mean = total / count
+        std = None
+        if count > 1:
+            variance = stats.squares[row, column] - total * shifted_mean
+            variance = max(variance / (count - 1), 0.0)
+            std = round(float(np.sqrt(variance)), 2)
+
+        mean = round(float(shifted_mean + shift), 2)
+        minimum = stats.minimum[row, column] + shift
+        maximum = stats.maximum[row, column] + shift
+        if self.is_integer[column]:
+            minimum, maximum = int(round(minimum)), int(round(maximum))
+        else:
+            minimum = round(float(minimum), 2)
+            maximum = round(float(maximum), 2)
+        return dict(zip(STAT_NAMES, (mean, maximum, minimum, std)))
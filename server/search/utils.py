@@ -1,8 +1,38 @@
+import uuid
+from array import array
+from datetime import datetime, timezone
+
 import numpy as np
 import pandas as pd
+from pymongo import ASCENDING, DeleteMany, ReplaceOne
 from pymongo.errors import DuplicateKeyError
 
-from server.database import MongoConnectionManager
+from server.config import read_config
+from server.database import AsyncMongoConnectionManager, MongoConnectionManager
+from server.search import popularity, recommender
+
+# fields embedded into the recommendation documents, enough to render a
+# property card without reading real_estate_details
+CARD_FIELDS = (
+    "id",
+    "Suburb",
+    "Address",
+    "Rooms",
+    "Type",
+    "Price",
+    "Distance",
+    "Bedroom2",
+    "Bathroom",
+    "Car",
+    "Landsize",
+    "BuildingArea",
+    "YearBuilt",
+    "Regionname",
+    "Lattitude",
+    "Longtitude",
+)
+# generated_recommendation document holding the cold-start recommendation
+POPULAR_USER_ID = "__popular__"
 
 
 def get_top_property_ids(n, df):
@@ -146,68 +176,253 @@ def create_user_item_matrix(df):
     return user_item  # return the user_item matrix
 
 
-def create_like_record(user_id: str, property_id: str):
+async def create_like_record(user_id: str, property_id: str):
     try:
-        with MongoConnectionManager("collaborative_recommendation") as conn:
-            conn.insert_one({"user_id": user_id, "property_id": property_id})
-            return True
+        async with AsyncMongoConnectionManager(
+            "collaborative_recommendation"
+        ) as conn:
+            created_at = datetime.now(timezone.utc)
+            await conn.insert_one(
+                {
+                    "user_id": user_id,
+                    "property_id": property_id,
+                    "created_at": created_at,
+                }
+            )
     except DuplicateKeyError as e:
         print(str(e))
         return False
 
+    await popularity.record_like(property_id, created_at)
+    return True
 
-def read_like_record(user_id: str):
-    with MongoConnectionManager("collaborative_recommendation") as conn:
-        data = list(conn.find({"user_id": user_id}, {"_id": 0}))
 
-    response = {"property_id": [doc["property_id"] for doc in data]}
+def _likes_query(user_id, after=None):
+    query = {"user_id": user_id}
+    if after is not None:
+        query["property_id"] = {"$gt": after}
+    return query
+
+
+async def read_liked_property_ids(user_id: str, limit=None, after=None):
+    """
+    Liked property ids in ascending order, starting past ``after``.
+
+    Pages are ranges of the unique (user_id, property_id) index, so every
+    page costs the same whatever the number of likes before it.
+    """
+    async with AsyncMongoConnectionManager(
+        "collaborative_recommendation"
+    ) as conn:
+        cursor = conn.find(
+            _likes_query(user_id, after), {"_id": 0, "property_id": 1}
+        ).sort("property_id", ASCENDING)
+        if limit:
+            cursor = cursor.limit(limit)
+        data = await cursor.to_list(length=None)
+
+    return [doc["property_id"] for doc in data]
+
+
+async def iter_liked_property_ids(
+    user_id: str, limit=None, after=None, batch_size=None
+):
+    """``read_liked_property_ids`` as the cursor yields them."""
+    batch_size = batch_size or read_config("stream_batch_size")
+    async with AsyncMongoConnectionManager(
+        "collaborative_recommendation"
+    ) as conn:
+        cursor = conn.find(
+            _likes_query(user_id, after),
+            {"_id": 0, "property_id": 1},
+            batch_size=batch_size,
+        ).sort("property_id", ASCENDING)
+        if limit:
+            cursor = cursor.limit(limit)
+        async for doc in cursor:
+            yield doc["property_id"]
+
+
+async def read_like_record(user_id: str, limit=None, after=None):
+    property_ids = await read_liked_property_ids(user_id, limit, after)
+    response = {"property_id": property_ids}
     return response
 
 
-def delete_like_record(user_id: str, property_id: str):
-    with MongoConnectionManager("collaborative_recommendation") as conn:
-        conn.delete_one({"user_id": user_id, "property_id": property_id})
-        return True
+async def delete_like_record(user_id: str, property_id: str):
+    async with AsyncMongoConnectionManager(
+        "collaborative_recommendation"
+    ) as conn:
+        deleted = await conn.find_one_and_delete(
+            {"user_id": user_id, "property_id": property_id},
+            {"created_at": 1},
+        )
 
+    if deleted is not None:
+        await popularity.record_like(
+            property_id, deleted.get("created_at"), delta=-1
+        )
+    return True
 
-def get_collaborative_recommendation_data():
+
+def stream_collaborative_recommendation_data(batch_size=None):
+    """
+    Every like as integer codes, for building the user x item matrix.
+
+    The cursor is read in batches with only the two id fields projected,
+    ids are mapped to codes as they arrive and the codes are appended to
+    compact int32 arrays, so memory grows with the number of likes
+    instead of holding one dict per document.
+    """
+    batch_size = batch_size or read_config("interaction_batch_size")
+    user_index, property_index = {}, {}
+    user_codes, property_codes = array("i"), array("i")
+    projection = {"_id": 0, "user_id": 1, "property_id": 1}
     with MongoConnectionManager("collaborative_recommendation") as conn:
-        data = list(conn.find({}))
+        cursor = conn.find({}, projection, batch_size=batch_size)
+        for doc in cursor:
+            user_codes.append(
+                user_index.setdefault(doc["user_id"], len(user_index))
+            )
+            property_codes.append(
+                property_index.setdefault(
+                    doc["property_id"], len(property_index)
+                )
+            )
+
+    return recommender.Interactions(
+        list(user_index),
+        list(property_index),
+        np.frombuffer(user_codes, dtype=np.int32),
+        np.frombuffer(property_codes, dtype=np.int32),
+    )
 
-    return data
 
+def reupload_collaborative_recommedation_data(data, chunk_size=None):
+    """
+    Replace every generated recommendation at once.
 
-def reupload_collaborative_recommedation_data(data):
-    with MongoConnectionManager("generated_recommendation") as conn:
-        conn.delete_many({})
-        print("old data deleted")
-        conn.insert_many(data)
-        print("new data uploaded")
+    The documents are written to a staging collection in unordered chunks,
+    indexed, and then renamed over ``generated_recommendation``, so
+    readers see either the complete old set or the complete new one and
+    never an empty collection.
+    """
+    chunk_size = chunk_size or read_config("recommendation_publish_chunk_size")
+    staging_name = f"generated_recommendation_staging_{uuid.uuid4().hex}"
+    with MongoConnectionManager(staging_name) as staging:
+        try:
+            for start in range(0, len(data), chunk_size):
+                staging.insert_many(
+                    data[start : start + chunk_size], ordered=False
+                )
+            staging.create_index("user_id", unique=True)
+            staging.rename("generated_recommendation", dropTarget=True)
+        except Exception:
+            staging.drop()
+            raise
+    print(f"published {len(data)} generated recommendations")
+
+
+def property_card(doc):
+    """
+    The card of a property document or catalog row: every card field,
+    None when missing, and the id as a string.
+    """
+    card = {field: doc.get(field) for field in CARD_FIELDS}
+    card["id"] = str(card["id"])
+    return card
 
 
-def read_single_property_data(property_id: str):
+def read_property_cards(property_ids):
+    """Card fields of the given properties, keyed by property id."""
+    projection = {"_id": 0, **{field: 1 for field in CARD_FIELDS}}
     with MongoConnectionManager("real_estate_details") as conn:
-        data = list(conn.find({"id": property_id}, {"_id": 0}))[0]
+        cursor = conn.find({"id": {"$in": list(property_ids)}}, projection)
+        return {doc["id"]: property_card(doc) for doc in cursor}
 
-    return data
+
+def popular_document(property_ids):
+    return {"user_id": POPULAR_USER_ID, "property_id": list(property_ids)}
 
 
-def read_liked_property_details(user_id: str):
-    pipeline = [
-        {"$match": {"user_id": user_id}},
-        {
-            "$lookup": {
-                "from": "real_estate_details",
-                "localField": "property_id",
-                "foreignField": "id",
-                "as": "result",
-            }
-        },
-        {"$project": {"_id": 0, "result._id": 0}},
+def add_property_cards(documents):
+    """
+    Embed the card of every recommended property into the documents, in
+    recommendation order, so reading them takes a single ``find_one``.
+    """
+    property_ids = {
+        property_id for doc in documents for property_id in doc["property_id"]
+    }
+    cards = read_property_cards(property_ids)
+    for doc in documents:
+        doc["properties"] = [
+            cards[property_id]
+            for property_id in doc["property_id"]
+            if property_id in cards
+        ]
+    return documents
+
+
+def upsert_generated_recommendations(data, removed_user_ids=()):
+    operations = [
+        ReplaceOne({"user_id": doc["user_id"]}, doc, upsert=True)
+        for doc in data
     ]
+    if removed_user_ids:
+        operations.append(
+            DeleteMany({"user_id": {"$in": list(removed_user_ids)}})
+        )
+    if not operations:
+        return
 
-    with MongoConnectionManager("collaborative_recommendation") as conn:
-        data = list(conn.aggregate(pipeline))
+    with MongoConnectionManager("generated_recommendation") as conn:
+        conn.bulk_write(operations, ordered=False)
+
+
+async def read_single_property_data(property_id: str):
+    async with AsyncMongoConnectionManager("real_estate_details") as conn:
+        data = await conn.find_one({"id": property_id}, {"_id": 0})
+
+    return data
 
-    response = [doc["result"][0] for doc in data]
+
+async def read_property_details(property_ids):
+    """Property documents in the order of ``property_ids``."""
+    async with AsyncMongoConnectionManager("real_estate_details") as conn:
+        cursor = conn.find({"id": {"$in": list(property_ids)}}, {"_id": 0})
+        properties = {doc["id"]: doc for doc in await cursor.to_list(None)}
+
+    response = [
+        properties[property_id]
+        for property_id in property_ids
+        if property_id in properties
+    ]
     return response
+
+
+async def read_liked_property_details(user_id: str):
+    # two indexed finds instead of a $lookup per liked property
+    property_ids = await read_liked_property_ids(user_id)
+    return await read_property_details(property_ids)
+
+
+async def iter_liked_property_details(
+    user_id: str, limit=None, after=None, batch_size=None
+):
+    """
+    The documents of ``read_liked_property_details``, fetched one batch of
+    likes at a time, so memory is bounded by ``batch_size``.
+    """
+    batch_size = batch_size or read_config("stream_batch_size")
+    batch = []
+    async for property_id in iter_liked_property_ids(
+        user_id, limit, after, batch_size
+    ):
+        batch.append(property_id)
+        if len(batch) >= batch_size:
+            for doc in await read_property_details(batch):
+                yield doc
+            batch = []
+    if batch:
+        for doc in await read_property_details(batch):
+            yield doc
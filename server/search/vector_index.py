@@ -0,0 +1,124 @@
+import numpy as np
+
+from server.config import read_config
+
+
+def top_k(scores, k):
+    """
+    Positions of the ``k`` largest scores, best first, without sorting the
+    whole array.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        positions = np.argpartition(-scores, k - 1)[:k]
+    else:
+        positions = np.arange(len(scores))
+    return positions[np.argsort(-scores[positions], kind="stable")]
+
+
+def _normalize(query):
+    query = np.asarray(query, dtype=np.float32).ravel()
+    norm = np.linalg.norm(query)
+    return query / norm if norm else query
+
+
+class ExactIndex:
+    """Brute-force cosine search over row-normalized embeddings."""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def __len__(self):
+        return self.embeddings.shape[0]
+
+    def search(self, query, k):
+        scores = self.embeddings @ _normalize(query)
+        positions = top_k(scores, k)
+        return positions, scores[positions]
+
+
+class IVFIndex:
+    """
+    Inverted-file index: rows are bucketed under k-means centroids and a
+    query only scores the rows of its ``n_probe`` closest buckets.
+
+    ``n_lists`` trades build time and recall for speed, ``n_probe`` trades
+    latency for recall at query time.
+    """
+
+    def __init__(self, embeddings, n_lists=None, n_probe=8, n_iter=10, seed=0):
+        self.embeddings = embeddings
+        n_rows = embeddings.shape[0]
+        if not n_lists:
+            n_lists = int(np.sqrt(n_rows))
+        self.n_lists = max(1, min(n_lists, n_rows))
+        self.n_probe = n_probe
+        self.centroids = self._train(n_iter, seed)
+
+        assignments = self._assign(self.centroids)
+        # rows grouped by list, list ``i`` is order[offsets[i]:offsets[i+1]]
+        self.order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=self.n_lists)
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def __len__(self):
+        return self.embeddings.shape[0]
+
+    def _assign(self, centroids, chunk_size=65536):
+        n_rows = self.embeddings.shape[0]
+        assignments = np.empty(n_rows, dtype=np.int64)
+        for start in range(0, n_rows, chunk_size):
+            chunk = self.embeddings[start : start + chunk_size]
+            assignments[start : start + chunk_size] = np.argmax(
+                chunk @ centroids.T, axis=1
+            )
+        return assignments
+
+    def _train(self, n_iter, seed):
+        rng = np.random.default_rng(seed)
+        n_rows = self.embeddings.shape[0]
+        picked = rng.choice(n_rows, self.n_lists, replace=False)
+        centroids = np.array(self.embeddings[np.sort(picked)], np.float32)
+
+        for _ in range(n_iter):
+            assignments = self._assign(centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, self.embeddings)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # keep the previous centroid for lists that ran empty
+            filled = norms[:, 0] > 0
+            centroids[filled] = sums[filled] / norms[filled]
+        return centroids
+
+    def search(self, query, k, n_probe=None):
+        query = _normalize(query)
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        lists = top_k(self.centroids @ query, n_probe)
+        candidates = np.concatenate(
+            [self.order[self.offsets[i] : self.offsets[i + 1]] for i in lists]
+        )
+        scores = self.embeddings[candidates] @ query
+        best = top_k(scores, k)
+        return candidates[best], scores[best]
+
+
+backends = {
+    "exact": ExactIndex,
+    "ivf": IVFIndex,
+}
+
+
+def build_vector_index(embeddings, backend=None):
+    backend = backend or read_config("vector_index_backend")
+    if backend not in backends:
+        raise ValueError(f"unknown vector index backend: {backend}")
+
+    if backend == "ivf":
+        return IVFIndex(
+            embeddings,
+            n_lists=read_config("ivf_n_lists"),
+            n_probe=read_config("ivf_n_probe"),
+        )
+    return backends[backend](embeddings)
@@ -0,0 +1,12 @@
+import os
+
+# the settings without defaults, importing server.config needs them
+for name, value in {
+    "APP_NAME": "prop-hub-test",
+    "SECRET_KEY": "test-secret",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "MONGO_CONNECTION_URI": "mongodb://localhost:27017",
+    "DATABASE_NAME": "prop_hub_test",
+}.items():
+    os.environ.setdefault(name, value)
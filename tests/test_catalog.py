@@ -0,0 +1,45 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from server.search.catalog import Catalog
+
+FINAL_CSV = os.path.join(os.path.dirname(__file__), "..", "final.csv")
+
+
+@pytest.fixture(scope="module")
+def frame():
+    return pd.read_csv(FINAL_CSV)
+
+
+@pytest.fixture(scope="module")
+def catalog(frame):
+    return Catalog.from_frame(frame)
+
+
+def stored_documents(frame):
+    """The real_estate_details documents, ids are stored as strings."""
+    details = frame.astype({"id": str})
+    return details.replace({np.nan: None}).to_dict("records")
+
+
+def test_records_match_the_stored_documents(frame, catalog):
+    documents = stored_documents(frame)
+    rows = np.random.default_rng(0).choice(len(frame), 50, replace=False)
+    for row, record in zip(rows, catalog.records(rows)):
+        expected = documents[row]
+        assert list(record) == list(expected)
+        assert isinstance(record["id"], str)
+        for name, value in expected.items():
+            if isinstance(value, float):
+                assert record[name] == pytest.approx(value), name
+            else:
+                assert record[name] == value, name
+
+
+def test_lookup_by_string_id(frame, catalog):
+    property_id = str(frame["id"].iloc[7])
+    assert catalog.get(property_id)["Address"] == frame["Address"].iloc[7]
+    assert catalog.record(catalog.row_of(property_id))["id"] == property_id
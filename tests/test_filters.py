@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pytest
+
+from server.search.catalog import Catalog
+from server.search.filters import RANGE_COLUMNS, AttributeIndex
+
+FINAL_CSV = os.path.join(os.path.dirname(__file__), "..", "final.csv")
+
+
+@pytest.fixture(scope="module")
+def attributes():
+    return AttributeIndex(Catalog.from_csv(FINAL_CSV))
+
+
+def everything(attributes):
+    return np.arange(attributes.size)
+
+
+@pytest.mark.parametrize("name", RANGE_COLUMNS)
+def test_rows_match_on_column_values(attributes, name):
+    values = attributes.values[name]
+    rng = np.random.default_rng(0)
+    # bounds read from the column as Python floats, like query parameters
+    bounds = [
+        float(str(value))
+        for value in rng.choice(values[~np.isnan(values)], 10)
+    ]
+    for low, high in zip(bounds, bounds[::-1]):
+        for ranges in (
+            {name: (low, low)},
+            {name: (low, None)},
+            {name: (None, high)},
+            {name: (min(low, high), max(low, high))},
+        ):
+            expected = np.flatnonzero(
+                attributes.matches(everything(attributes), ranges, {})
+            )
+            found = np.sort(attributes.rows(ranges, {}))
+            np.testing.assert_array_equal(found, expected, str(ranges))
+
+
+def test_distance_on_a_bound(attributes):
+    ranges = {"Distance": (2.3, 2.3)}
+    expected = attributes.matches(everything(attributes), ranges, {})
+    assert expected.sum() > 0
+    assert len(attributes.rows(ranges, {})) == expected.sum()
+
+
+def test_rows_combine_ranges_and_categories(attributes):
+    ranges = {"Distance": (2.3, 13.8), "Rooms": (2.5, None)}
+    categories = {"Type": {"h"}}
+    expected = np.flatnonzero(
+        attributes.matches(everything(attributes), ranges, categories)
+    )
+    found = np.sort(attributes.rows(ranges, categories))
+    np.testing.assert_array_equal(found, expected)
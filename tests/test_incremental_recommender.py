@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from server.search import recommender
+
+
+def random_likes(n_users, n_properties, n_likes, seed):
+    rng = np.random.default_rng(seed)
+    pairs = {
+        (f"u{user}", f"p{item}")
+        for user, item in zip(
+            rng.integers(0, n_users, n_likes),
+            rng.integers(0, n_properties, n_likes),
+        )
+    }
+    return sorted(pairs)
+
+
+def frame(pairs):
+    return pd.DataFrame(sorted(pairs), columns=["user_id", "property_id"])
+
+
+def recommendations(state):
+    return {doc["user_id"]: doc["property_id"] for doc in state.documents()}
+
+
+def test_deltas_match_a_full_recompute():
+    pairs = random_likes(40, 30, 150, seed=0)
+    current = set(pairs[:100])
+    state = recommender.IncrementalRecommender.from_frame(frame(current))
+
+    rng = np.random.default_rng(1)
+    for step in range(120):
+        if step % 3 == 0 and current:
+            # unlike a random existing pair
+            pair = sorted(current)[rng.integers(0, len(current))]
+            current.discard(pair)
+            state.apply(*pair, liked=False)
+        else:
+            pair = pairs[rng.integers(0, len(pairs))]
+            current.add(pair)
+            state.apply(*pair, liked=True)
+
+        expected = recommender.IncrementalRecommender.from_frame(
+            frame(current)
+        )
+        assert recommendations(state) == recommendations(expected)
+
+
+def test_new_user_and_removed_user():
+    state = recommender.IncrementalRecommender.from_frame(
+        frame([("u1", "p1"), ("u1", "p2"), ("u2", "p1")])
+    )
+
+    updated, removed = state.apply("u3", "p2", liked=True)
+    assert "u3" in updated and removed == []
+    assert (
+        recommendations(state)["u3"]
+        == recommendations(
+            recommender.IncrementalRecommender.from_frame(
+                frame([("u1", "p1"), ("u1", "p2"), ("u2", "p1"), ("u3", "p2")])
+            )
+        )["u3"]
+    )
+
+    updated, removed = state.apply("u3", "p2", liked=False)
+    assert removed == ["u3"]
+    assert "u3" not in recommendations(state)
+
+
+def test_repeated_delta_changes_nothing():
+    state = recommender.IncrementalRecommender.from_frame(
+        frame([("u1", "p1"), ("u2", "p1"), ("u2", "p2")])
+    )
+    assert state.apply("u1", "p1", liked=True) == ([], [])
+    assert state.apply("u1", "p9", liked=False) == ([], [])
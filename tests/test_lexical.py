@@ -0,0 +1,79 @@
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from server.search import lexical
+
+DOCUMENTS = [
+    "Sunny family house with a garden and a pool",
+    "Modern apartment close to the beach",
+    "Garden apartment, garden views, quiet street",
+    "",
+    "House near the station, 3 bedrooms",
+    "Renovated house with pool house and large garden",
+]
+
+
+def reference_scores(documents, query, k1=1.2, b=0.75):
+    """Okapi BM25 written out term by term."""
+    tokenized = [lexical.tokenize(text) for text in documents]
+    average = max(sum(map(len, tokenized)) / len(tokenized), 1.0)
+    scores = []
+    for tokens in tokenized:
+        counts = Counter(tokens)
+        score = 0.0
+        for term in set(lexical.tokenize(query)):
+            n_matches = sum(term in doc for doc in tokenized)
+            if not counts[term]:
+                continue
+            idf = math.log(
+                1 + (len(documents) - n_matches + 0.5) / (n_matches + 0.5)
+            )
+            norm = k1 * (1 - b + b * len(tokens) / average)
+            score += idf * counts[term] * (k1 + 1) / (counts[term] + norm)
+        scores.append(score)
+    return np.array(scores)
+
+
+@pytest.mark.parametrize(
+    "query", ["garden", "house pool", "GARDEN apartment", "castle", ""]
+)
+def test_scores_match_reference(query):
+    index = lexical.BM25Index()
+    index.add(DOCUMENTS)
+    np.testing.assert_allclose(
+        index.scores(query), reference_scores(DOCUMENTS, query), rtol=1e-5
+    )
+
+
+def test_incremental_adds_match_one_build():
+    index = lexical.BM25Index()
+    index.add(DOCUMENTS[:2])
+    index.scores("garden")
+    index.add(DOCUMENTS[2:4])
+    index.add(DOCUMENTS[4:])
+    for query in ["garden", "house pool", "beach station"]:
+        np.testing.assert_allclose(
+            index.scores(query),
+            reference_scores(DOCUMENTS, query),
+            rtol=1e-5,
+        )
+
+
+def test_search_returns_matches_best_first():
+    index = lexical.BM25Index()
+    index.add(DOCUMENTS)
+    rows, scores = index.search("garden", 10)
+    assert set(rows) == {0, 2, 5}
+    assert list(scores) == sorted(scores, reverse=True)
+    assert rows[0] == 2
+
+
+def test_reciprocal_rank_fusion():
+    rows, scores = lexical.reciprocal_rank_fusion(
+        [np.array([1, 2, 3]), np.array([3, 1, 4])], k=3, constant=60
+    )
+    assert list(rows) == [1, 3, 2]
+    assert scores[0] == pytest.approx(1 / 61 + 1 / 62)
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from server import config
+from server.search import popularity
+
+
+@pytest.fixture
+def half_life():
+    previous = config.settings["popularity_half_life_days"]
+    config.settings["popularity_half_life_days"] = 0.01
+    yield 0.01 * 86400
+    config.settings["popularity_half_life_days"] = previous
+
+
+def test_log_weight_does_not_overflow(half_life):
+    created_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    expected = (created_at - popularity.EPOCH).total_seconds() / half_life
+    assert expected > 1024  # 2.0 ** expected overflows
+    assert popularity.log_weight(created_at) == pytest.approx(expected)
+    assert popularity.log_weight(created_at.replace(tzinfo=None)) == (
+        popularity.log_weight(created_at)
+    )
+    assert popularity.log_weight(None) == 0.0
+
+
+def test_log_weight_halves_per_half_life(half_life):
+    created_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    older = created_at - timedelta(seconds=half_life)
+    newer, older = map(popularity.log_weight, (created_at, older))
+    assert newer - older == pytest.approx(1.0)
+    # two likes one half-life ago weigh as much as one like now
+    assert np.logaddexp2(older, older) == pytest.approx(newer)
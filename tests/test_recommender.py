@@ -0,0 +1,59 @@
+import os
+
+import pandas as pd
+import pytest
+
+from server.search import recommender, utils
+
+USER_ITEM_CSV = os.path.join(os.path.dirname(__file__), "..", "user_item.csv")
+
+
+def legacy_recommend_all(df, m):
+    user_item = utils.create_user_item_matrix(df)
+    return [
+        {
+            "user_id": user_id,
+            "property_id": list(utils.user_user_recs(user_id, user_item, m)),
+        }
+        for user_id in df.user_id.unique()
+    ]
+
+
+@pytest.fixture
+def likes():
+    # ties in similarity, a user sharing nothing with anyone, a user who
+    # has seen everything and duplicate likes
+    pairs = [
+        ("u1", "p1"),
+        ("u1", "p2"),
+        ("u1", "p3"),
+        ("u2", "p1"),
+        ("u2", "p2"),
+        ("u2", "p4"),
+        ("u3", "p2"),
+        ("u3", "p3"),
+        ("u3", "p5"),
+        ("u3", "p5"),
+        ("u4", "p6"),
+        ("u5", "p1"),
+        ("u5", "p2"),
+        ("u5", "p3"),
+        ("u5", "p4"),
+        ("u5", "p5"),
+        ("u5", "p6"),
+        ("u6", "p4"),
+    ]
+    return pd.DataFrame(pairs, columns=["user_id", "property_id"])
+
+
+@pytest.mark.parametrize("m", [1, 2, 3, 10])
+def test_sparse_matches_user_user_recs(likes, m):
+    assert recommender.recommend_all(likes, m) == legacy_recommend_all(
+        likes, m
+    )
+
+
+def test_sparse_matches_user_user_recs_on_user_item_csv():
+    # ids are stored as strings in mongo
+    df = pd.read_csv(USER_ITEM_CSV, dtype=str)
+    assert recommender.recommend_all(df, 10) == legacy_recommend_all(df, 10)
@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from server.search.catalog import Catalog
+from server.search.stats import StatsEngine
+
+FINAL_CSV = os.path.join(os.path.dirname(__file__), "..", "final.csv")
+
+
+def pivot_statistics(data):
+    """The pandas pivot tables /stats/ was computed with before."""
+    response = {}
+    for field in ["Price", "Landsize", "Rooms"]:
+        res = pd.pivot_table(
+            data,
+            values=field,
+            index=["Regionname"],
+            # the names pandas 1.5 maps np.mean, np.max, np.min and np.std
+            # to, later versions call np.std itself (ddof=0)
+            aggfunc=["mean", "max", "min", "std"],
+            margins=True,
+        )
+        res = res.droplevel(1, axis=1)
+        res = res.round(2).replace({np.nan: None, pd.NA: None})
+        res = res.rename(columns={"max": "amax", "min": "amin"})
+        response[field] = res.to_dict(orient="index")
+    return response
+
+
+def assert_same(found, expected):
+    assert found.keys() == expected.keys()
+    for field in expected:
+        assert found[field].keys() == expected[field].keys(), field
+        for group, stats in expected[field].items():
+            for name, value in stats.items():
+                got = found[field][group][name]
+                if value is None:
+                    assert got is None, (field, group, name)
+                else:
+                    # both round to 2 decimals, from different float sums
+                    assert got == pytest.approx(value, abs=0.011), (
+                        field,
+                        group,
+                        name,
+                    )
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    return Catalog.from_csv(FINAL_CSV)
+
+
+@pytest.fixture(scope="module")
+def engine(catalog):
+    return StatsEngine(catalog)
+
+
+def test_unfiltered_matches_pivot_tables(catalog, engine):
+    assert_same(engine.query(), pivot_statistics(catalog.to_frame()))
+
+
+def test_score_threshold_matches_pivot_tables(catalog, engine):
+    scores = np.random.default_rng(0).random(len(catalog))
+    data = catalog.to_frame()
+    expected = pivot_statistics(data[scores > 0.7])
+    assert_same(engine.query(scores, 0.7), expected)
+
+
+def test_type_and_price_filters(catalog, engine):
+    data = catalog.to_frame()
+    selected = data[
+        data["Type"].isin(["u", "t"])
+        & (data["Price"] >= 500000)
+        & (data["Price"] <= 900000)
+    ]
+    found = engine.query(types=("t", "u"), price_range=(500000, 900000))
+    assert_same(found, pivot_statistics(selected))